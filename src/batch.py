@@ -0,0 +1,144 @@
+# src/batch.py
+"""
+Batch conversion of many STDF files in a single process pool.
+
+Each worker process imports the converter (pandas, pydantic, templates, decoders)
+once and then converts files one after another, so the import cost is paid per
+worker instead of per file.
+"""
+import csv
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .converter import run_conversion
+from .core.output_sinks.stats_sink import StatsSink
+from .utils.files import get_output_paths
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = ['file', 'status', 'size_bytes', 'records', 'seconds', 'mb_per_second', 'records_per_second', 'error']
+
+
+def _limit_worker_memory(memory_limit_mb: Optional[int]) -> None:
+    """Process pool initializer: cap the address space of the worker process."""
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        logger.warning("Memory ceiling is not supported on this platform; running workers without it")
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    _, hard_limit = resource.getrlimit(resource.RLIMIT_AS)
+    if hard_limit != resource.RLIM_INFINITY:
+        limit = min(limit, hard_limit)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard_limit))
+
+
+def _convert_file(stdf_path: str, output_formats: Optional[List[str]],
+                  records_to_process: Optional[List[str]], modifier_type: Optional[str],
+                  pipeline: bool = False, chain_check_bytes: int = 0) -> Dict[str, Any]:
+    """Worker: convert one STDF file and return its summary row."""
+    size = os.path.getsize(stdf_path)
+    output_paths = get_output_paths(Path(stdf_path), output_formats)
+    stats_sink = StatsSink()
+    start_time = time.perf_counter()
+    try:
+        # Records are only streamed to the output files, none are kept in memory
+        run_conversion(
+            stdf_input_file=stdf_path,
+            atdf_output_file=output_paths['atdf'],
+            json_output_file=output_paths['json'],
+            ndjson_output_file=output_paths['ndjson'],
+            csv_output_prefix=output_paths['csv'],
+            stats_output_file=output_paths['stats'],
+            records_to_process=records_to_process,
+            modifier_type=modifier_type,
+            keep_record_types=[],
+            sinks=[stats_sink],
+            pipeline=pipeline,
+            chain_check_bytes=chain_check_bytes
+        )
+        status, error = 'ok', ''
+        record_count = stats_sink.total_records
+    except MemoryError:
+        status, error, record_count = 'failed', 'memory ceiling exceeded', 0
+    except Exception as e:
+        status, error, record_count = 'failed', str(e), 0
+    seconds = time.perf_counter() - start_time
+    return {
+        'file': stdf_path,
+        'status': status,
+        'size_bytes': size,
+        'records': record_count,
+        'seconds': round(seconds, 3),
+        'mb_per_second': round(size / (1024 * 1024) / seconds, 3) if seconds else 0.0,
+        'records_per_second': round(record_count / seconds, 1) if seconds else 0.0,
+        'error': error,
+    }
+
+
+def write_summary(summary_file: str, rows: List[Dict[str, Any]]) -> None:
+    """Write the per-file batch summary as CSV."""
+    with open(summary_file, 'w', newline='') as f_summary:
+        writer = csv.DictWriter(f_summary, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_batch(
+        stdf_files: List[Path],
+        output_formats: Optional[List[str]] = None,
+        records_to_process: Optional[List[str]] = None,
+        modifier_type: Optional[str] = None,
+        workers: Optional[int] = None,
+        memory_limit_mb: Optional[int] = None,
+        summary_file: Optional[str] = None,
+        pipeline: bool = False,
+        chain_check_bytes: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Convert many STDF files concurrently in a process pool.
+    Files are scheduled largest first, so a large file started last does not extend the total wall time.
+    Output files are named after each input file, as in single-file mode.
+    With pipeline, each file is converted in pipeline mode; chain_check_bytes is passed to
+    run_conversion for every file.
+    Returns the summary rows (one per file, in scheduling order) and optionally writes them to summary_file.
+    """
+    workers = workers or os.cpu_count() or 1
+    stdf_files = sorted(stdf_files, key=lambda path: path.stat().st_size, reverse=True)
+    logger.info(f"Converting {len(stdf_files)} files with {workers} worker processes")
+
+    rows: Dict[str, Dict[str, Any]] = {}
+    batch_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_limit_worker_memory,
+                             initargs=(memory_limit_mb,)) as executor:
+        futures = {executor.submit(_convert_file, str(path), output_formats, records_to_process, modifier_type,
+                                   pipeline, chain_check_bytes): str(path)
+                   for path in stdf_files}
+        for future in as_completed(futures):
+            stdf_path = futures[future]
+            try:
+                row = future.result()
+            except BrokenProcessPool as e:
+                # A worker was killed (e.g. by the OS when out of memory); the pool cannot be reused
+                row = {'file': stdf_path, 'status': 'failed', 'error': f"worker process died: {e}"}
+            logger.info(f"[{len(rows) + 1}/{len(stdf_files)}] {row['status']}: {stdf_path}")
+            rows[stdf_path] = row
+
+    summary_rows = [rows[str(path)] for path in stdf_files]
+    failed = sum(1 for row in summary_rows if row['status'] != 'ok')
+    total_mb = sum(path.stat().st_size for path in stdf_files) / (1024 * 1024)
+    elapsed = time.perf_counter() - batch_start
+    logger.info(f"Batch finished: {len(stdf_files) - failed} succeeded, {failed} failed, "
+                f"{total_mb:.1f} MB in {elapsed:.1f} s")
+
+    if summary_file:
+        write_summary(summary_file, summary_rows)
+        logger.info(f"Batch summary written to {summary_file}")
+    return summary_rows
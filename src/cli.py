@@ -6,9 +6,13 @@ import pandas as pd # Added for temporary verification
 import sys # Added for sys.exit in __main__
 from typing import Optional, List, Dict # Added for type hints
 
-# Removed: from .utils.files import find_stdf_files
 # Removed: from .core.utils.services import process_files
 from .converter import run_conversion # Added
+from .batch import run_batch
+from .utils.files import find_stdf_files, get_output_paths, STDF_CHAIN_CHECK_BYTES
+from .core.stdf_parser.index import build_index
+from .core.output_sinks.columnar_sink import ColumnarSink
+from .core.data_transformers.record_modifiers.base import MODIFIERS, get_record_modifier
 def setup_logging():
     """Configure logging for the entire application."""
     logging.basicConfig(
@@ -27,95 +31,156 @@ def parse_arguments():
     parser = argparse.ArgumentParser(description='STDF to ATDF conversion tool')
     # Existing arguments
     parser.add_argument('input',
-                        help='Input STDF file path (must be a single file).') # Updated help string
+                        nargs='+',
+                        help='Input STDF file path. Several files, directories (searched recursively for '
+                             '.stdf files, also compressed as .gz, .bz2 or .xz) or glob patterns select batch mode.')
     parser.add_argument('--output', '-o',
                         nargs='+',
-                        choices=['atdf', 'json'],
-                        help="Specify output formats. Choose 'atdf', 'json', or both. Files will be named based on the input file.")
+                        choices=['atdf', 'json', 'ndjson', 'csv', 'stats'],
+                        help="Specify output formats. Choose any of 'atdf', 'json' (grouped by record type), "
+                             "'ndjson' (JSON Lines, one record per line), 'csv' (one <input>.<record type>.csv "
+                             "file per record type) and 'stats' (record counts as <input>.stats.json). All formats "
+                             "are written from a single pass over the input. Files will be named based on the input file.")
     parser.add_argument('--records', '-r',
                         nargs='*',
                         help='Specific record types to process')
 
     # Simplified modifier argument
     parser.add_argument('--modifier', '-m',  # Changed from --preprocessor, -p
-                        choices=['advantest', 'teradyne', 'eagle'],
-                        help='Specify the record modifier to use')  # Updated help text
-    return parser.parse_args()
+                        help=f"Specify the record modifier to use: one of {', '.join(sorted(MODIFIERS))}, "
+                             "or the path of a rule file (.json, .toml, .yaml) with field rewrites "
+                             "per record type")  # Updated help text
+    parser.add_argument('--build-index',
+                        action='store_true',
+                        help="Only scan record headers and write a record-offset index next to the input "
+                             "(e.g. input.stdf.idx) for random access by wafer, part or record type.")
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        help="Number of worker processes. For a single file, values above 1 split an uncompressed "
+                             "input into chunks that are converted in parallel (default: 1). In batch mode, the "
+                             "number of files converted concurrently (default: number of CPUs).")
+    parser.add_argument('--check-chain',
+                        action='store_true',
+                        help='Before converting, also check the record headers in the first MiB of the input: '
+                             'every record must be of a known STDF V4 type and the records must chain up. '
+                             'The input is rejected otherwise.')
+    parser.add_argument('--pipeline',
+                        action='store_true',
+                        help='Run a sequential conversion as pipelined stages: a reader thread, the decoder and '
+                             'one writer thread per output, connected by bounded queues. The busy and waiting '
+                             'time of each stage is logged.')
+    parser.add_argument('--keep-records',
+                        nargs='*',
+                        help='Record types to keep in memory for the verification output (default: all). '
+                             'Without values, no records are kept and memory use does not grow with the file size.')
+    parser.add_argument('--max-memory',
+                        type=int,
+                        help='Batch mode: address space ceiling per worker process in MB.')
+    parser.add_argument('--summary',
+                        default='batch_summary.csv',
+                        help='Batch mode: CSV file for the per-file status and throughput summary '
+                             '(default: batch_summary.csv).')
+    args = parser.parse_args()
+    if args.modifier:
+        # Load and compile the modifier once up front, so that a bad name or rule file stops here
+        try:
+            get_record_modifier(args.modifier)
+        except ValueError as e:
+            parser.error(f"argument --modifier/-m: {e}")
+    return args
+
+
+def run_batch_mode(args) -> int:
+    """Convert all STDF files selected by the input files, directories and glob patterns."""
+    stdf_files = find_stdf_files(args.input)
+    if not stdf_files:
+        logger.error(f"No STDF files found in {' '.join(args.input)}")
+        return 1
+
+    if args.build_index:
+        for stdf_path in stdf_files:
+            build_index(str(stdf_path))
+        return 0
+
+    summary_rows = run_batch(
+        stdf_files,
+        output_formats=args.output,
+        records_to_process=args.records,
+        modifier_type=args.modifier,
+        workers=args.workers,
+        memory_limit_mb=args.max_memory,
+        pipeline=args.pipeline,
+        chain_check_bytes=STDF_CHAIN_CHECK_BYTES if args.check_chain else 0,
+        summary_file=args.summary
+    )
+    return 0 if all(row['status'] == 'ok' for row in summary_rows) else 1
 
 
 def main() -> int: # Explicitly indicate return type is exit code
     setup_logging() # Added logging setup call
     args = parse_arguments()
-    input_path = Path(args.input)
     exit_code = 0 # Default success exit code
 
+    if len(args.input) > 1 or not Path(args.input[0]).is_file():
+        return run_batch_mode(args)
+
+    input_path = Path(args.input[0])
     try:
         if not input_path.is_file():
             logger.error(f"Input path must be a file. Provided path '{input_path}' is invalid or a directory.")
             return 1 # Error exit code
         
+        if args.build_index:
+            build_index(str(input_path))
+            return exit_code
+
         # validate_input_file() in converter.py will check if it's a valid STDF
 
         # Call run_conversion directly for the single file
         stdf_input_str = str(input_path)
-        atdf_output_str: Optional[str] = None
-        json_output_str: Optional[str] = None
-
-        if args.output: # args.output is now a list or None
-            if 'atdf' in args.output:
-                atdf_output_str = str(input_path.with_suffix('.atdf'))
-            if 'json' in args.output:
-                json_output_str = str(input_path.with_suffix('.json'))
+        output_paths = get_output_paths(input_path, args.output) # args.output is now a list or None
 
-        file_processed_data: Dict[str, List[Dict]] = run_conversion(
+        # Kept records go straight into typed column buffers, which become the DataFrames below
+        columnar_sink = ColumnarSink(args.keep_records)
+        run_conversion(
             stdf_input_file=stdf_input_str,
-            atdf_output_file=atdf_output_str,
-            json_output_file=json_output_str, # New argument
+            atdf_output_file=output_paths['atdf'],
+            json_output_file=output_paths['json'], # New argument
+            ndjson_output_file=output_paths['ndjson'],
+            csv_output_prefix=output_paths['csv'],
+            stats_output_file=output_paths['stats'],
             records_to_process=args.records,
-            modifier_type=args.modifier  # Changed from preprocessor_type and args.preprocessor
+            modifier_type=args.modifier,  # Changed from preprocessor_type and args.preprocessor
+            workers=args.workers or 1,
+            keep_record_types=[],
+            sinks=[columnar_sink],
+            pipeline=args.pipeline,
+            chain_check_bytes=STDF_CHAIN_CHECK_BYTES if args.check_chain else 0
         )
-        # For the temporary verification step, wrap the single dict in a list
-        processed_data_list = [file_processed_data] if file_processed_data else []
         logger.info(f"Conversion completed successfully for {input_path}") # Adjusted log message
 
         # --- TEMPORARY VERIFICATION STEP ---
         # This section prints the enriched data as DataFrames for inspection.
         # It should be removed or commented out for production use.
         logger.info("\n--- TEMPORARY VERIFICATION OUTPUT ---")
-        if not processed_data_list:
-            logger.info("No data processed or returned by process_files.")
-        
-        for file_idx, file_data_dict in enumerate(processed_data_list): # This loop will run once or zero times
-            if not isinstance(file_data_dict, dict):
-                logger.warning(f"Data for file index {file_idx} is not a dictionary: {type(file_data_dict)}. Skipping.")
-                continue
-
-            # Since we process one file, input_path.name can be used directly
-            # No need for input_files list or file_idx for filename
-            print(f"\n\n--- Data for Input File: {input_path.name} ---")
-
-
-            if not file_data_dict:
-                print("  No records processed for this file.")
-                continue
-
-            for record_type, records_list in file_data_dict.items():
-                print(f"\n-- Record Type: {record_type} --")
-                if records_list:
-                    try:
-                        df = pd.DataFrame(records_list)
-                        if len(df) > 10: # Only print head and tail if more than 10 rows
-                            print("  First 5 rows:")
-                            print(df.head(5).to_string())
-                            print("\n  Last 5 rows:")
-                            print(df.tail(5).to_string())
-                        else: # Print all if 10 rows or less
-                            print(df.to_string())
-                    except Exception as df_e:
-                        print(f"  Error creating/printing DataFrame for {record_type}: {df_e}")
-                        print(f"  Raw records list (first 5 items): {records_list[:5]}") # Print first 5 items of raw list on error
-                else:
-                    print("  No records of this type.")
+        frames: Dict[str, pd.DataFrame] = columnar_sink.to_dataframes()
+        print(f"\n\n--- Data for Input File: {input_path.name} ---")
+
+        if not frames:
+            print("  No records processed for this file.")
+
+        for record_type, df in frames.items():
+            print(f"\n-- Record Type: {record_type} --")
+            try:
+                if len(df) > 10: # Only print head and tail if more than 10 rows
+                    print("  First 5 rows:")
+                    print(df.head(5).to_string())
+                    print("\n  Last 5 rows:")
+                    print(df.tail(5).to_string())
+                else: # Print all if 10 rows or less
+                    print(df.to_string())
+            except Exception as df_e:
+                print(f"  Error printing DataFrame for {record_type}: {df_e}")
         logger.info("--- END OF TEMPORARY VERIFICATION OUTPUT ---\n")
         # --- END OF TEMPORARY VERIFICATION STEP ---
 
@@ -1,27 +1,45 @@
 # src/converter.py
+import copy
+import heapq
+import io
 import logging
-import json # Added for JSON operations
-from typing import Optional, List, Dict, Any
-from collections import defaultdict # Added for defaultdict
-from pydantic import BaseModel, ValidationError
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple, Union, Deque, Iterable, Iterator, NamedTuple
+from pathlib import Path
+from pydantic import BaseModel, Field, ValidationError
 
 # from .core.utils.files import managed_files # Old import
 #from .core.stdf.preprocessing import determine_file_params, read_record_header
 # Imports moved to stdf_parser module
-from .core.stdf_parser.handler import setup_record_flags, determine_file_params, \
-    read_record_header, handle_stdf_entry # Changed from handle_stdf_entries
-from .core.stdf_parser.templates import create_stdf_mapping, get_stdf_template # Moved STDF template functions
+from .core.stdf_parser.handler import setup_record_flags, setup_record_keys, determine_file_params, \
+    iter_stdf_records, handle_stdf_entry # Changed from handle_stdf_entries
+from .core.stdf_parser.templates import create_stdf_mapping # Moved STDF template functions
+from .core.stdf_parser.schema import RecordSchema, find_stdf_schema
+from .core.stdf_parser.index import StdfIndex, get_index_path, load_index, scan_index
+from .core.stdf_parser.batch_reader import iter_record_batches
 # Imports from new utils location
 from .utils.files import validate_input_file, managed_files # Added managed_files here
+from .utils.files import validate_stdf_file, get_file_handle, is_compressed
 from .utils.decorators import timing_decorator
+from .utils.timing import StageTimer, log_stage_timings
 # Database import removed/commented previously
 # from .core.utils.database import create_database_from_atdf
 # ATDF imports - REMOVE old handler, ADD new generator handler parts
 # from .core.atdf.handler import handle_atdf_entries # REMOVE THIS
-from .core.atdf_generator.handler import handle_atdf_entry, write_atdf_file # ADD THIS
-from .core.atdf_generator.templates import get_atdf_template # Import from new location
-from .core.data_transformers.record_modifiers.base import modify_record # Renamed import
-from .core.data_transformers.id_enricher import add_hierarchical_ids
+from .core.atdf_generator.handler import handle_atdf_entry # ADD THIS
+from .core.data_transformers.record_modifiers.base import get_record_modifier, apply_modifier, \
+    apply_modifier_batch # Renamed import
+from .core.data_transformers.id_enricher import add_hierarchical_ids, IdEnrichmentState
+from .core.output_sinks.base import RecordSink, MemorySink
+from .core.output_sinks.atdf_sink import AtdfSink
+from .core.output_sinks.json_sink import JsonSink, JsonPartsSink, NdjsonSink
+from .core.output_sinks.csv_sink import CsvSink
+from .core.output_sinks.stats_sink import StatsSink
+from .core.output_sinks.threaded_sink import ThreadedSink
 
 # try:
 #     import django
@@ -32,79 +50,380 @@ from .core.data_transformers.id_enricher import add_hierarchical_ids
 
 logger = logging.getLogger(__name__)
 
+# Number of chunks per worker process in a parallel conversion. More chunks than workers
+# keeps all workers busy when some parts of the file convert slower than others.
+CHUNKS_PER_WORKER = 4
+# Largest byte range of a chunk. With at most workers + 1 chunks in flight, this bounds the
+# memory held for results that are not written yet, whatever the file size. The JSON and
+# JSON Lines text of a chunk can be some 30 times its STDF size.
+CHUNK_MAX_BYTES = 1 << 20
 
-class RecordProcessingContext(BaseModel):
-    data: Optional[bytes] = None
-    endianness: str
-    stdf_template: Dict[str, Any] # Modified in place by handle_stdf_entry, used by handle_atdf_entry
-    atdf_template: Dict[str, Any]
-    stdf_file: Any  # File-like object
-    atdf_file: Optional[Any] = None # File-like object, can be None
-    modifier_type: Optional[str] = None  # Renamed from preprocessor_type
-    # counters, stdf_processed_entries, and atdf_processed_entries removed
-    # always_return_atdf_dict removed as it's implicit or handled by caller
+
+class ConversionOptions(BaseModel):
+    """Arguments of run_conversion, validated once per call (not per record)."""
+    stdf_input_file: Union[str, Path]
+    atdf_output_file: Optional[Union[str, Path]] = None
+    json_output_file: Optional[Union[str, Path]] = None
+    ndjson_output_file: Optional[Union[str, Path]] = None
+    csv_output_prefix: Optional[Union[str, Path]] = None
+    stats_output_file: Optional[Union[str, Path]] = None
+    records_to_process: Optional[List[str]] = None
+    modifier_type: Optional[str] = None
+    workers: int = Field(1, ge=1)
+    keep_record_types: Optional[List[str]] = None
+    sinks: Optional[List[RecordSink]] = None
+    compact_records: bool = False
+    writer_threads: bool = True
+    pipeline: bool = False
+    stage_timings: Optional[Dict[str, Any]] = None
+    chain_check_bytes: int = Field(0, ge=0)
 
     class Config:
         arbitrary_types_allowed = True
 
 
-def process_record(
-    context: RecordProcessingContext,
-    stdf_processed_entries: Dict[str, List[Dict[str, Any]]],
-    atdf_processed_entries: Dict[str, List[Dict[str, Any]]],
-    counters: Dict[str, int]
-) -> None:
+class RecordProcessingContext:
     """
-    Process a single STDF record.
-    Phase 3 Change: This now only handles the STDF part and calls the new ATDF generator
-                    for dictionary creation and file writing if needed.
-                    Preprocessing and ID enrichment are temporarily bypassed here and
-                    will be integrated in later phases via converter_service.py.
-    """
-    # 1. Process STDF data (get STDF dictionary representation)
-    #    handle_stdf_entry parses the data and updates context.stdf_template['fields'] with values.
-    #    The result is then appended to stdf_processed_entries[record_type].
-    if context.data: # Check if data exists (e.g., not EPS)
-        # Call handle_stdf_entry directly
-        parsed_stdf_record = handle_stdf_entry(
-            context.stdf_template, # This template is modified by handle_stdf_entry
-            context.data,
-            context.endianness
-        )
-        # Append the parsed STDF record to the stdf_processed_entries collection
-        # This step was previously inside handle_stdf_entries
-        stdf_record_type = context.stdf_template.get('record_type', 'Unknown') # Get record_type for stdf collection
-        stdf_processed_entries[stdf_record_type].append(parsed_stdf_record)
-
-    # 2. Generate base ATDF dictionary (using the new ATDF generator handler)
-    #    This uses the values populated in context.stdf_template by the call to handle_stdf_entry above.
-    base_atdf_entry = handle_atdf_entry(context.atdf_template, context.stdf_template)
-
-    # 3. Apply Modifier
-    # Get record_type for modifier, enricher, and atdf collection from atdf_template
-    atdf_record_type = context.atdf_template['record_type']
-    modified_atdf_entry = modify_record( # Renamed function call
+    Per-file state of a conversion, created once per file and shared by all its records.
+    A plain __slots__ class: building or reading it costs nothing per record.
+    The modifier is looked up once here; an unknown modifier_type raises ValueError.
+    """
+    __slots__ = ('stdf_mapping', 'endianness', 'stdf_file', 'modifier_type', 'modifier')
+
+    def __init__(self, stdf_mapping: Dict[Tuple[int, int], str], endianness: str,
+                 stdf_file: Any = None, modifier_type: Optional[str] = None):
+        self.stdf_mapping = stdf_mapping # (rec_typ, rec_sub) -> record type
+        self.endianness = endianness
+        self.stdf_file = stdf_file # File-like object
+        self.modifier_type = modifier_type
+        self.modifier = get_record_modifier(modifier_type) # RecordModifier, None without modifier
+
+
+def convert_record(context: RecordProcessingContext, stdf_schema: RecordSchema, data: Any,
+                   modify: bool = True) -> Tuple[str, Dict[str, Any]]:
+    """
+    Convert a single STDF record into its (modified) ATDF dictionary.
+    Covers steps 1-3 of process_record: STDF parsing, ATDF mapping and record modification.
+    ID enrichment is left to the caller, as it depends on the records seen before this one.
+
+    Args:
+        context: Per-file state (endianness, modifier).
+        stdf_schema: Schema of the record type.
+        data: Record payload; bytes, or a memoryview into the memory-mapped STDF file.
+        modify: False to skip step 3, for callers that modify records in batches (see _modify_converted_batch).
+
+    Returns:
+        (atdf_record_type, modified_atdf_entry)
+    """
+    # 1. Process STDF data (decode the payload into a tuple of STDF values)
+    stdf_values: Tuple[Any, ...] = ()
+    if data: # Check if data exists (e.g., not EPS)
+        stdf_values = handle_stdf_entry(stdf_schema, data, context.endianness)
+
+    # 2. Generate base ATDF dictionary (using the mapping plan compiled for the record type)
+    # Get record_type for mapping, modifier, enricher, and atdf collection from the schema
+    atdf_record_type = stdf_schema.record_type
+    base_atdf_entry = handle_atdf_entry(atdf_record_type, stdf_values)
+
+    # 3. Apply Modifier, only to the record types it declares
+    modifier = context.modifier
+    if not modify or modifier is None or not modifier.applies_to(atdf_record_type):
+        return atdf_record_type, base_atdf_entry
+    modified_atdf_entry = apply_modifier(
+        modifier,
         atdf_record_type,
-        base_atdf_entry.copy(), # Pass a copy to avoid modifying base_atdf_entry if it's used elsewhere
-        context.modifier_type # Access directly, Pydantic handles None if optional
+        base_atdf_entry.copy() # Pass a copy to avoid modifying base_atdf_entry if it's used elsewhere
     )
 
-    # 4. Write to ATDF file if requested (using the MODIFIED entry)
-    if context.atdf_file: # Access directly
-        write_atdf_file(context.atdf_file, modified_atdf_entry, context.atdf_template)
+    return atdf_record_type, modified_atdf_entry
+
 
-    # 5. Apply ID Enrichment (modifies modified_atdf_entry in place and returns it)
+def collect_record(
+    atdf_record_type: str,
+    modified_atdf_entry: Dict[str, Any],
+    sinks: List[RecordSink],
+    id_state: IdEnrichmentState
+) -> None:
+    """
+    Steps 4-5 of process_record: enrich a converted ATDF entry with hierarchical IDs
+    and pass it to every sink. Must be called in original record order.
+    """
+    # 4. Apply ID Enrichment (modifies modified_atdf_entry in place and returns it)
     enriched_atdf_entry = add_hierarchical_ids(
         atdf_record_type,
         modified_atdf_entry, # Pass the (potentially) modified dictionary
-        atdf_processed_entries, # The main collection for context
-        counters # Pass counters directly
+        id_state # Latest WIR/PIR ids and id counters of the current file
     )
 
-    # 6. Append the enriched entry to the main ATDF collection
-    atdf_processed_entries[atdf_record_type].append(enriched_atdf_entry)
-    logger.debug(f"Appended to {atdf_record_type}: {enriched_atdf_entry}. "
-                 f"Total {atdf_record_type} entries: {len(atdf_processed_entries[atdf_record_type])}")
+    # 5. Hand the enriched entry to the sinks (ATDF/JSON writers, stats, in-memory collection)
+    for sink in sinks:
+        sink.write(atdf_record_type, enriched_atdf_entry)
+
+
+def process_record(
+    context: RecordProcessingContext,
+    stdf_schema: RecordSchema,
+    data: Any,
+    sinks: List[RecordSink],
+    id_state: IdEnrichmentState
+) -> None:
+    """
+    Process a single STDF record: convert it (convert_record), then enrich the
+    resulting ATDF entry and pass it to the sinks (collect_record).
+    """
+    atdf_record_type, modified_atdf_entry = convert_record(context, stdf_schema, data)
+    collect_record(atdf_record_type, modified_atdf_entry, sinks, id_state)
+
+
+def _convert_raw_record(
+    context: RecordProcessingContext,
+    rec_typ: int,
+    rec_sub: int,
+    data: Any,
+    modify: bool = True
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Look up the schema of a raw STDF record and convert it (see convert_record).
+    Errors are logged and None is returned, so that a bad record does not stop the conversion.
+    """
+    try:
+        stdf_schema = find_stdf_schema(context.stdf_mapping, rec_typ, rec_sub)
+        return convert_record(context, stdf_schema, data, modify)
+    except Exception as e:
+        logger.error(f"Generic error processing record: {e}", exc_info=True) # Add exc_info for more details
+    return None
+
+
+def _collect_converted_record(converted_record: Tuple[str, Dict[str, Any]], sinks: List[RecordSink],
+                              id_state: IdEnrichmentState) -> None:
+    """collect_record with errors logged instead of raised, so that a bad record does not stop the conversion."""
+    try:
+        collect_record(*converted_record, sinks, id_state)
+    except Exception as e:
+        logger.error(f"Generic error processing record: {e}", exc_info=True) # Add exc_info for more details
+
+
+class _ChunkTask(NamedTuple):
+    """Work of one worker process in a parallel conversion: a byte range and the outputs to render."""
+    stdf_input_file: str
+    start: int # File offsets at record boundaries
+    end: int
+    records_to_process: Optional[List[str]]
+    modifier_type: Optional[str]
+    id_state: IdEnrichmentState # State of the id enrichment at start (see _iter_chunk_id_states)
+    write_atdf: bool
+    json_output_file: Optional[str] # Set if the worker encodes the JSON entries
+    write_ndjson: bool
+    count_records: bool
+    return_records: bool
+
+
+class _ChunkResult(NamedTuple):
+    """Output of one chunk, each part empty if the task did not ask for it."""
+    atdf_text: str
+    json_parts: Dict[str, str] # Record type -> encoded entries (see JsonPartsSink)
+    ndjson_text: str
+    record_counts: Dict[str, int]
+    converted_records: List[Tuple[str, Dict[str, Any]]] # Enriched, in file order
+
+
+def _convert_chunk(task: _ChunkTask) -> _ChunkResult:
+    """
+    Worker for parallel conversion: convert the records in one byte range of an uncompressed STDF file.
+    Records are enriched from the id state at the chunk start, so the worker renders the ATDF,
+    JSON and JSON Lines text of the chunk and counts its records; the converted records themselves
+    are only returned for the other sinks (return_records).
+    """
+    stdf_mapping = create_stdf_mapping()
+    record_keys = setup_record_keys(setup_record_flags(task.records_to_process), stdf_mapping)
+    id_state = task.id_state
+    atdf_buffer, ndjson_buffer = io.StringIO(), io.StringIO()
+    atdf_sink = AtdfSink(atdf_file=atdf_buffer) if task.write_atdf else None
+    json_sink = JsonPartsSink(task.json_output_file) if task.json_output_file else None
+    ndjson_sink = NdjsonSink(ndjson_file=ndjson_buffer) if task.write_ndjson else None
+    stats_sink = StatsSink() if task.count_records else None
+    sinks = [sink for sink in (atdf_sink, json_sink, ndjson_sink, stats_sink) if sink]
+    converted = []
+
+    with get_file_handle(task.stdf_input_file, 'rb') as stdf_file:
+        endianness = determine_file_params(stdf_file)['endianness']
+        context = RecordProcessingContext(stdf_mapping, endianness, stdf_file, task.modifier_type)
+        stdf_file.seek(task.start)
+        for rec_typ, rec_sub, data in iter_stdf_records(stdf_file, endianness, record_keys, task.end):
+            converted_record = _convert_raw_record(context, rec_typ, rec_sub, data)
+            if converted_record is None:
+                continue
+            try:
+                add_hierarchical_ids(*converted_record, id_state)
+            except Exception as e:
+                logger.error(f"Generic error processing record: {e}", exc_info=True)
+                continue
+            # Each sink on its own, as behind the writer threads of a sequential conversion
+            for sink in sinks:
+                try:
+                    sink.write(*converted_record)
+                except Exception as e:
+                    logger.error(f"Generic error processing record: {e}", exc_info=True)
+            if task.return_records:
+                converted.append(converted_record)
+
+    if atdf_sink:
+        atdf_sink.close() # Writes the buffered lines; atdf_buffer stays open
+    return _ChunkResult(atdf_buffer.getvalue(), json_sink.get_parts() if json_sink else {},
+                        ndjson_buffer.getvalue(), dict(stats_sink.record_counts) if stats_sink else {},
+                        converted)
+
+
+def _iter_chunk_id_states(stdf_input_file: str, index: StdfIndex, chunk_starts: Iterable[int],
+                          records_to_process: Optional[List[str]],
+                          modifier_type: Optional[str]) -> Iterator[IdEnrichmentState]:
+    """
+    Yield the state of the id enrichment at each chunk start (in file order). Only WIR and PIR
+    records change it, so these are read from their indexed offsets and converted (modifier
+    included) before the chunk, as a sequential conversion would.
+    """
+    stdf_mapping = create_stdf_mapping()
+    record_keys = setup_record_keys(setup_record_flags(records_to_process), stdf_mapping)
+    parent_ordinals = heapq.merge(index.markers['WIR'], index.markers['PIR'])
+    id_state = IdEnrichmentState()
+
+    with get_file_handle(stdf_input_file, 'rb') as stdf_file:
+        context = RecordProcessingContext(stdf_mapping, index.endianness, stdf_file, modifier_type)
+        ordinal = next(parent_ordinals, None)
+        for chunk_start in chunk_starts:
+            while ordinal is not None and index.offsets[ordinal] < chunk_start:
+                rec_typ, rec_sub = index.rec_typs[ordinal], index.rec_subs[ordinal]
+                if record_keys is None or (rec_typ, rec_sub) in record_keys:
+                    stdf_file.seek(index.offsets[ordinal] + 4) # Payload after the record header
+                    data = stdf_file.read(index.rec_lens[ordinal])
+                    converted_record = _convert_raw_record(context, rec_typ, rec_sub, data)
+                    if converted_record is not None:
+                        try:
+                            add_hierarchical_ids(*converted_record, id_state)
+                        except Exception as e:
+                            logger.error(f"Generic error processing record: {e}", exc_info=True)
+                ordinal = next(parent_ordinals, None)
+            # A copy, as the task holding it is pickled only when a worker picks it up
+            yield copy.deepcopy(id_state)
+
+
+def _write_chunk_result(result: _ChunkResult, atdf_sink: Optional[RecordSink], json_sink: Optional[RecordSink],
+                        ndjson_sink: Optional[RecordSink], stats_sink: Optional[StatsSink],
+                        record_sinks: List[RecordSink]) -> None:
+    """Pass the output of one chunk to the sinks."""
+    if atdf_sink:
+        atdf_sink.write_text(result.atdf_text)
+    if json_sink:
+        json_sink.write_parts(result.json_parts)
+    if ndjson_sink:
+        ndjson_sink.write_text(result.ndjson_text)
+    if stats_sink:
+        stats_sink.add_counts(result.record_counts)
+    for atdf_record_type, enriched_atdf_entry in result.converted_records:
+        try:
+            for sink in record_sinks:
+                sink.write(atdf_record_type, enriched_atdf_entry)
+        except Exception as e:
+            logger.error(f"Generic error processing record: {e}", exc_info=True)
+
+
+def _run_parallel_conversion(
+    stdf_input_file: str,
+    atdf_sink: Optional[RecordSink],
+    json_sink: Optional[RecordSink],
+    ndjson_sink: Optional[RecordSink],
+    stats_sink: Optional[StatsSink],
+    record_sinks: List[RecordSink],
+    records_to_process: Optional[List[str]],
+    modifier_type: Optional[str],
+    workers: int
+) -> None:
+    """
+    Convert an uncompressed STDF file with several worker processes.
+
+    The file is split at record boundaries (using the index sidecar if present, otherwise
+    a header-only scan) into byte ranges of at most about CHUNK_MAX_BYTES that are converted
+    independently. Each worker starts from the id enrichment state at its chunk start, so it
+    enriches its records itself and renders the ATDF, JSON and JSON Lines text and the record
+    counts (atdf_sink, json_sink, ndjson_sink, stats_sink); only record_sinks receive records.
+    Chunks are submitted in file order, with at most workers + 1 in flight, and their results
+    are written in file order, so memory use does not grow with the file and the output is
+    identical to a sequential conversion.
+    """
+    index_path = get_index_path(stdf_input_file)
+    index = load_index(stdf_input_file) if os.path.exists(index_path) else scan_index(stdf_input_file)
+    chunk_count = max(workers * CHUNKS_PER_WORKER, math.ceil(index.source_size / CHUNK_MAX_BYTES))
+    chunks = index.split(chunk_count)
+    logger.info(f"Converting {len(index)} records in {len(chunks)} chunks with {workers} worker processes")
+    id_states = _iter_chunk_id_states(stdf_input_file, index, (start for start, _ in chunks),
+                                      records_to_process, modifier_type)
+    # Output path of the JSON sink, named in the workers' error messages
+    json_output_file = None
+    if json_sink:
+        json_output_file = (json_sink.sink if isinstance(json_sink, ThreadedSink) else json_sink).json_path
+
+    # managed_files validates the input; the workers open it themselves
+    with managed_files(stdf_input_file):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending: Deque[Future] = deque()
+            for (start, end), id_state in zip(chunks, id_states):
+                if len(pending) > workers:
+                    _write_chunk_result(pending.popleft().result(), atdf_sink, json_sink, ndjson_sink,
+                                        stats_sink, record_sinks)
+                pending.append(executor.submit(_convert_chunk, _ChunkTask(
+                    stdf_input_file, start, end, records_to_process, modifier_type, id_state,
+                    atdf_sink is not None, json_output_file, ndjson_sink is not None, stats_sink is not None,
+                    bool(record_sinks))))
+            while pending:
+                _write_chunk_result(pending.popleft().result(), atdf_sink, json_sink, ndjson_sink,
+                                    stats_sink, record_sinks)
+
+
+def _modify_converted_batch(context: RecordProcessingContext,
+                            converted: List[Optional[Tuple[str, Dict[str, Any]]]]) -> None:
+    """
+    Step 3 of convert_record for a batch of records converted with modify=False: the entries
+    of each record type the modifier affects are modified with one apply_modifier_batch call.
+    converted is updated in place and keeps its order.
+    """
+    modifier = context.modifier
+    if modifier is None:
+        return
+    positions: Dict[str, List[int]] = {} # Record type -> positions of its records in converted
+    for position, converted_record in enumerate(converted):
+        if converted_record is not None and modifier.applies_to(converted_record[0]):
+            positions.setdefault(converted_record[0], []).append(position)
+    for atdf_record_type, record_positions in positions.items():
+        modified_entries = apply_modifier_batch(modifier, atdf_record_type,
+                                                [converted[position][1] for position in record_positions])
+        for position, modified_atdf_entry in zip(record_positions, modified_entries):
+            converted[position] = (atdf_record_type, modified_atdf_entry)
+
+
+def _run_pipelined_conversion(
+    context: RecordProcessingContext,
+    record_keys: Optional[Any],
+    sinks: List[RecordSink],
+    id_state: IdEnrichmentState,
+    reader_timer: StageTimer,
+    decoder_timer: StageTimer
+) -> None:
+    """
+    Decode stage of a pipelined conversion: convert the record batches read by the reader thread
+    (see batch_reader) and pass them to the sinks, whose file writers run in their own threads.
+    The modifier is applied once per record type and batch (see _modify_converted_batch).
+    """
+    for batch in iter_record_batches(context.stdf_file, context.endianness, record_keys,
+                                     reader_timer, decoder_timer):
+        start = time.perf_counter()
+        converted = [_convert_raw_record(context, rec_typ, rec_sub, data, modify=False)
+                     for rec_typ, rec_sub, data in batch]
+        _modify_converted_batch(context, converted)
+        for converted_record in converted:
+            if converted_record is not None:
+                _collect_converted_record(converted_record, sinks, id_state)
+        decoder_timer.busy += time.perf_counter() - start
+        decoder_timer.records += len(batch)
 
 
 @timing_decorator
@@ -112,95 +431,156 @@ def run_conversion(
         stdf_input_file: str, # Renamed for clarity from services.py call
         atdf_output_file: Optional[str] = None, # Renamed for clarity
         json_output_file: Optional[str] = None, # New parameter for JSON output
+        ndjson_output_file: Optional[str] = None, # JSON Lines output, one record per line
+        csv_output_prefix: Optional[str] = None, # CSV output, one '<prefix>.<record type>.csv' file per record type
+        stats_output_file: Optional[str] = None, # Record statistics as JSON
         # output_atdf_database parameter removed
         records_to_process: Optional[List[str]] = None, # Type hint updated
-        modifier_type: Optional[str] = None  # Renamed from preprocessor_type
+        modifier_type: Optional[str] = None,  # Renamed from preprocessor_type
+        workers: int = 1,
+        keep_record_types: Optional[List[str]] = None,
+        sinks: Optional[List[RecordSink]] = None,
+        compact_records: bool = False,
+        writer_threads: bool = True,
+        pipeline: bool = False,
+        stage_timings: Optional[Dict[str, Any]] = None,
+        chain_check_bytes: int = 0
         # counters parameter will be added when add_hierarchical_ids is implemented
 ) -> Dict[str, List[Dict]]:
     """
     Run STDF to ATDF conversion.
-    Optionally writes to an ATDF file.
-    Always returns a dictionary containing the processed ATDF entries, keyed by record type.
+    Records are decoded once and streamed through output sinks, then dropped: an ATDF writer
+    if atdf_output_file is given, JSON writers if json_output_file (grouped by record type)
+    or ndjson_output_file (one record per line) are given, CSV files per record type if
+    csv_output_prefix is given, record statistics if stats_output_file is given, and any
+    caller-supplied sinks (opened and closed by run_conversion). If the conversion fails, the
+    sinks are aborted instead of closed (see RecordSink.abort): the output files written so far
+    are deleted, and a JSON output is not written.
+    With writer_threads, each of the file writers (ATDF, JSON, JSON Lines, CSV) runs in its
+    own thread behind a bounded queue (see ThreadedSink); caller-supplied sinks are called
+    from the converting thread.
+    With pipeline, a sequential conversion runs as three stages connected by bounded queues:
+    a reader thread reading record batches (see batch_reader), the decode stage (decoding,
+    mapping, modifiers and ID enrichment) in the calling thread, and the writer threads.
+    The busy and waiting time of each stage is logged and, if a stage_timings dict is
+    given, stored in it by stage name ('read', 'decode', 'write:AtdfSink', ...).
+    With workers > 1, an uncompressed input is converted by that many processes in parallel
+    (compressed input cannot be split and is converted sequentially).
+
+    Returns a dictionary containing the processed ATDF entries of the record types in
+    keep_record_types, keyed by record type. All record types are kept if keep_record_types
+    is None; pass an empty list for a conversion whose memory use does not grow with the file.
+    With compact_records, the kept entries are slot records (see core.records) with an
+    as_dict() method instead of dicts, which needs much less memory for large files.
+
+    With chain_check_bytes (e.g. STDF_CHAIN_CHECK_BYTES), the record headers in that many leading
+    bytes are checked too (known record types, records chaining up) before anything is converted.
+
+    The arguments are validated once (ConversionOptions); invalid arguments raise a
+    pydantic ValidationError (a ValueError).
     """
+    try:
+        ConversionOptions(
+            stdf_input_file=stdf_input_file, atdf_output_file=atdf_output_file,
+            json_output_file=json_output_file, ndjson_output_file=ndjson_output_file,
+            csv_output_prefix=csv_output_prefix, stats_output_file=stats_output_file,
+            records_to_process=records_to_process, modifier_type=modifier_type, workers=workers,
+            keep_record_types=keep_record_types, sinks=sinks, compact_records=compact_records,
+            writer_threads=writer_threads, pipeline=pipeline, stage_timings=stage_timings,
+            chain_check_bytes=chain_check_bytes
+        )
+    except ValidationError as ve:
+        logger.error(f"Invalid conversion arguments: {ve.errors()}")
+        raise
     validate_input_file(stdf_input_file)
+    # Check the FAR header (and the record chain of the first chain_check_bytes bytes) before
+    # any sink opens (and truncates) its output file
+    validate_stdf_file(stdf_input_file, chain_check_bytes)
+
+    if workers > 1 and is_compressed(stdf_input_file):
+        logger.warning(f"{stdf_input_file} is compressed and cannot be split; converting it sequentially")
+        workers = 1
+    if pipeline and workers > 1:
+        logger.warning("Pipeline mode applies to sequential conversions; converting with worker processes instead")
+        pipeline = False
 
     stdf_mapping = create_stdf_mapping()
-    stdf_processed_entries = defaultdict(list)
-    atdf_processed_entries = defaultdict(list)
     record_flags = setup_record_flags(records_to_process)
-    
-    # Initialize counters for w_id and p_id generation for the current file
-    counters: Dict[str, int] = {'w_counter': 0, 'p_counter': 0}
+    # (rec_typ, rec_sub) keys to process; excluded records are skipped from their header alone
+    record_keys = setup_record_keys(record_flags, stdf_mapping)
 
-    try:
-        with managed_files(stdf_input_file, atdf_output_file) as (stdf_file, atdf_file_handle):
-            file_params = determine_file_params(stdf_file)
+    # Id counters and latest WIR/PIR ids for w_id and p_id generation for the current file
+    id_state = IdEnrichmentState()
 
-            while True:
-                header_data = read_record_header(stdf_file, file_params['endianness'])
-                if not header_data:
-                    break
+    atdf_sink: Optional[RecordSink] = AtdfSink(atdf_output_file) if atdf_output_file else None
+    json_sink: Optional[RecordSink] = JsonSink(json_output_file) if json_output_file else None
+    ndjson_sink: Optional[RecordSink] = NdjsonSink(ndjson_output_file) if ndjson_output_file else None
+    csv_sink: Optional[RecordSink] = CsvSink(csv_output_prefix) if csv_output_prefix else None
+    if writer_threads or pipeline:
+        # One writer thread per output file, so slow writes do not stall decoding
+        atdf_sink, json_sink, ndjson_sink, csv_sink = [ThreadedSink(sink) if sink else None
+                                                       for sink in (atdf_sink, json_sink, ndjson_sink, csv_sink)]
+    stats_sink = StatsSink(stats_output_file) if stats_output_file else None
+    memory_sink = MemorySink(keep_record_types, compact_records)
+    other_sinks: List[RecordSink] = list(sinks or [])
+    if keep_record_types is None or keep_record_types:
+        other_sinks.append(memory_sink)
+    all_sinks = [sink for sink in (atdf_sink, json_sink, ndjson_sink, csv_sink, stats_sink) if sink] + other_sinks
+    # Sinks that take records in a parallel conversion (the others take text rendered by the workers)
+    record_sinks = ([csv_sink] if csv_sink else []) + other_sinks
+    reader_timer, decoder_timer = StageTimer('read'), StageTimer('decode')
 
-                rec_len, rec_typ, rec_sub = header_data
-                data = stdf_file.read(rec_len)
+    try:
+        opened_sinks: List[RecordSink] = []
+        try:
+            for sink in all_sinks:
+                sink.open()
+                opened_sinks.append(sink)
 
-                if len(data) < rec_len:
-                    logger.error(f"Incomplete record data: expected {rec_len} bytes, got {len(data)}")
-                    continue
+            if workers > 1:
+                _run_parallel_conversion(stdf_input_file, atdf_sink, json_sink, ndjson_sink, stats_sink,
+                                         record_sinks, records_to_process, modifier_type, workers)
+            else:
+                with managed_files(stdf_input_file) as (stdf_file, _):
+                    file_params = determine_file_params(stdf_file)
+                    context = RecordProcessingContext(stdf_mapping, file_params['endianness'], stdf_file, modifier_type)
 
+                    if pipeline:
+                        _run_pipelined_conversion(context, record_keys, all_sinks, id_state,
+                                                  reader_timer, decoder_timer)
+                    else:
+                        # Uncompressed files are memory-mapped; data is then a zero-copy memoryview
+                        for rec_typ, rec_sub, data in iter_stdf_records(stdf_file, file_params['endianness'], record_keys):
+                            converted_record = _convert_raw_record(context, rec_typ, rec_sub, data)
+                            if converted_record is not None:
+                                _collect_converted_record(converted_record, all_sinks, id_state)
+        except BaseException:
+            # Discard the outputs of a failed conversion instead of finishing them as if it had succeeded
+            for sink in opened_sinks:
                 try:
-                    stdf_template = get_stdf_template(stdf_mapping, rec_typ, rec_sub)
-                    record_type = stdf_template['record_type']
-
-                    if not record_flags.get(record_type, False):
-                        continue
-
-                    atdf_template = get_atdf_template(record_type)
-
-                    context = RecordProcessingContext(
-                        data=data,
-                        endianness=file_params['endianness'],
-                        stdf_template=stdf_template, # This will be modified by handle_stdf_entry
-                        atdf_template=atdf_template,
-                        stdf_file=stdf_file,
-                        atdf_file=atdf_file_handle,
-                        modifier_type=modifier_type  # Renamed from preprocessor_type
-                    )
-                    process_record(
-                        context=context,
-                        stdf_processed_entries=stdf_processed_entries,
-                        atdf_processed_entries=atdf_processed_entries,
-                        counters=counters
-                    )
-
-                except ValidationError as ve:
-                    logger.error(f"Pydantic ValidationError creating context for record: {ve.errors()}")
-                    # Optionally, log the problematic data: logger.error(f"Problematic context_data: {context_data}")
-                    continue
-                except Exception as e:
-                    logger.error(f"Generic error processing record: {e}", exc_info=True) # Add exc_info for more details
-                    continue
+                    sink.abort()
+                except Exception as abort_error:
+                    logger.error(f"Error discarding the output of {type(sink).__name__}: {abort_error}")
+            raise
+        for sink in opened_sinks:
+            sink.close()
+
+        if pipeline:
+            writer_sinks = [sink for sink in all_sinks if isinstance(sink, ThreadedSink)]
+            # Time the decode stage spent blocked on full writer queues is waiting, not work
+            blocked_seconds = sum(sink.blocked_seconds for sink in writer_sinks)
+            decoder_timer.busy -= blocked_seconds
+            decoder_timer.waiting += blocked_seconds
+            timings = log_stage_timings([reader_timer, decoder_timer] + [sink.timer for sink in writer_sinks])
+            if stage_timings is not None:
+                stage_timings.update(timings)
         # Database creation logic removed.
 
         logger.info(f"Successfully processed {stdf_input_file}")
 
-        # Write to JSON file if path is provided
-        if json_output_file:
-            logger.info(f"Writing processed ATDF data to JSON file: {json_output_file}")
-            try:
-                with open(json_output_file, 'w') as f_json:
-                    json.dump(atdf_processed_entries, f_json, indent=4) # indent=4 for readability
-                logger.info(f"Successfully wrote JSON to {json_output_file}")
-            except IOError as e:
-                logger.error(f"Error writing JSON to {json_output_file}: {e}")
-            except TypeError as e:
-                logger.error(f"Error serializing data to JSON for {json_output_file}: {e}. Ensure all data is JSON serializable.")
-
-        # Return the processed ATDF entries
-        # WARNING: As noted in process_record, this dictionary will be incomplete
-        #          during Phase 3 as enrichment is bypassed. It will be corrected in Phase 4/5.
+        # Return the ATDF entries kept in memory
         # logger.debug(f"Final atdf_processed_entries before return: {atdf_processed_entries}") # Removed for less verbose logging
-        return atdf_processed_entries
+        return memory_sink.entries
 
     except Exception as e:
         logger.exception(f"Fatal error during conversion of {stdf_input_file}: {e}")
@@ -4,12 +4,16 @@
 
 import datetime
 import logging
+import numpy as np
 import pytz # For timezone handling
 
 logger = logging.getLogger(__name__)
 
-def format_pass_fail_flag(stdf_values): # Renamed from parse_pass_fail_flag
-    test_flg, parm_flg = int(stdf_values[0], 2), int(stdf_values[1], 2)
+# Flag (B*1) formatters. Flags are decoded as ints. Each formatter below is evaluated once
+# for every possible flag value (or test_flg/parm_flg pair) into a lookup table when the
+# module is imported; the format_xxx functions used by the mappings only index the table.
+
+def _pass_fail_flag(test_flg, parm_flg):
     test_flg_bit_6 = (test_flg >> 6) & 1
     test_flg_bit_7 = (test_flg >> 7) & 1
     parm_flg_bit_5 = (parm_flg >> 5) & 1
@@ -26,8 +30,7 @@ def format_pass_fail_flag(stdf_values): # Renamed from parse_pass_fail_flag
             return "F"
     return None
 
-def format_alarm_flags(stdf_values): # Renamed from parse_alarm_flags
-    test_flg, parm_flg = int(stdf_values[0], 2), int(stdf_values[1], 2)
+def _alarm_flags(test_flg, parm_flg):
     flags = {
         'A': (test_flg >> 0) & 1,
         'D': (parm_flg >> 1) & 1,
@@ -105,16 +108,14 @@ def format_state_field(stdf_values): # Renamed from parse_state_field
 def format_data_file_type(_): # Renamed from parse_data_file_type
     return 'A'
 
-def format_pass_fail_code(stdf_value): # Renamed from parse_pass_fail_code
-    binary_value = int(stdf_value, 2)
+def _pass_fail_code(binary_value):
     bit_3 = (binary_value >> 3) & 1
     bit_4 = (binary_value >> 4) & 1
     if bit_4 == 0:
         return "P" if bit_3 == 0 else "F"
     return "F"
 
-def format_retest_code(stdf_value): # Renamed from parse_retest_code
-    binary_value = int(stdf_value, 2)
+def _retest_code(binary_value):
     bit_0 = (binary_value >> 0) & 1
     bit_1 = (binary_value >> 1) & 1
     if bit_1 == 0 and bit_0 == 0:
@@ -124,30 +125,26 @@ def format_retest_code(stdf_value): # Renamed from parse_retest_code
     elif bit_1 == 1 and bit_0 == 0:
         return "C"
 
-def format_abort_code(stdf_value): # Renamed from parse_abort_code
-    binary_value = int(stdf_value, 2)
+def _abort_code(binary_value):
     bit_2 = (binary_value >> 2) & 1
     return None if bit_2 == 0 else "Y"
 
 def format_head_or_site_number(stdf_value): # Renamed from parse_head_or_site_number
     return None if stdf_value == 255 else stdf_value
 
-def format_limit_compare(stdf_value): # Renamed from parse_limit_compare
-    binary_value = int(stdf_value, 2)
+def _limit_compare(binary_value):
     bit_6 = (binary_value >> 6) & 1
     bit_7 = (binary_value >> 7) & 1
     return ''.join(['L' if bit_6 else '', 'H' if bit_7 else '']) if any([bit_6, bit_7]) else None
 
-def format_ftr_pass_fail_flag(stdf_value): # Renamed from parse_ftr_pass_fail_flag
-    binary_value = int(stdf_value, 2)
+def _ftr_pass_fail_flag(binary_value):
     bit_6 = (binary_value >> 6) & 1
     bit_7 = (binary_value >> 7) & 1
     if bit_6 == 0:
         return "P" if bit_7 == 0 else "F"
     return "F"
 
-def format_ftr_alarm_flags(stdf_value): # Renamed from parse_ftr_alarm_flags
-    binary_value = int(stdf_value, 2)
+def _ftr_alarm_flags(binary_value):
     flags = {
         'A': (binary_value >> 0) & 1,
         'N': (binary_value >> 4) & 1,
@@ -157,6 +154,61 @@ def format_ftr_alarm_flags(stdf_value): # Renamed from parse_ftr_alarm_flags
     }
     return ''.join([key for key, value in flags.items() if value]) if any(flags.values()) else None
 
+def _build_flag_table(flag_formatter):
+    """Values of a one-flag formatter for the flag values 0-255."""
+    return tuple(flag_formatter(flag) for flag in range(256))
+
+def _build_flag_pair_table(flag_formatter, test_flg_mask, parm_flg_mask):
+    """
+    Values of a test_flg/parm_flg formatter, indexed by test_flg << 8 | parm_flg.
+    The formatter only reads the bits in the masks, so it is evaluated once per combination of those bits.
+    """
+    values = {}
+    table = []
+    for test_flg in range(256):
+        test_bits = test_flg & test_flg_mask
+        for parm_flg in range(256):
+            key = (test_bits, parm_flg & parm_flg_mask)
+            if key not in values:
+                values[key] = flag_formatter(*key)
+            table.append(values[key])
+    return tuple(table)
+
+PASS_FAIL_FLAG_TABLE = _build_flag_pair_table(_pass_fail_flag, 0xC0, 0x20) # test_flg bits 6-7, parm_flg bit 5
+ALARM_FLAGS_TABLE = _build_flag_pair_table(_alarm_flags, 0x3D, 0x1F) # test_flg bits 0, 2-5, parm_flg bits 0-4
+PASS_FAIL_CODE_TABLE = _build_flag_table(_pass_fail_code)
+RETEST_CODE_TABLE = _build_flag_table(_retest_code)
+ABORT_CODE_TABLE = _build_flag_table(_abort_code)
+LIMIT_COMPARE_TABLE = _build_flag_table(_limit_compare)
+FTR_PASS_FAIL_FLAG_TABLE = _build_flag_table(_ftr_pass_fail_flag)
+FTR_ALARM_FLAGS_TABLE = _build_flag_table(_ftr_alarm_flags)
+
+def format_pass_fail_flag(stdf_values): # Renamed from parse_pass_fail_flag
+    test_flg, parm_flg = stdf_values
+    return PASS_FAIL_FLAG_TABLE[test_flg << 8 | parm_flg]
+
+def format_alarm_flags(stdf_values): # Renamed from parse_alarm_flags
+    test_flg, parm_flg = stdf_values
+    return ALARM_FLAGS_TABLE[test_flg << 8 | parm_flg]
+
+def format_pass_fail_code(stdf_value): # Renamed from parse_pass_fail_code
+    return PASS_FAIL_CODE_TABLE[stdf_value]
+
+def format_retest_code(stdf_value): # Renamed from parse_retest_code
+    return RETEST_CODE_TABLE[stdf_value]
+
+def format_abort_code(stdf_value): # Renamed from parse_abort_code
+    return ABORT_CODE_TABLE[stdf_value]
+
+def format_limit_compare(stdf_value): # Renamed from parse_limit_compare
+    return LIMIT_COMPARE_TABLE[stdf_value]
+
+def format_ftr_pass_fail_flag(stdf_value): # Renamed from parse_ftr_pass_fail_flag
+    return FTR_PASS_FAIL_FLAG_TABLE[stdf_value]
+
+def format_ftr_alarm_flags(stdf_value): # Renamed from parse_ftr_alarm_flags
+    return FTR_ALARM_FLAGS_TABLE[stdf_value]
+
 def format_ftr_relative_address(stdf_value): # Renamed from parse_ftr_relative_address
     return hex(stdf_value)[2:] if isinstance(stdf_value, int) else None
 
@@ -164,15 +216,25 @@ def format_generic_data(stdf_value): # Renamed from parse_generic_data
     return list(stdf_value)
 
 def format_mode_array(stdf_value): # Renamed from parse_mode_array
+    if isinstance(stdf_value, np.ndarray):
+        stdf_value = stdf_value.tolist()
     return [hex(num)[2:] for num in stdf_value]
 
 def format_radix_array(stdf_value): # Renamed from parse_radix_array
     mapping = {2: 'B', 8: 'O', 10: 'D', 16: 'H', 20: 'S'}
+    if isinstance(stdf_value, np.ndarray):
+        stdf_value = stdf_value.tolist()
     if all(element == 0 for element in stdf_value):
         return None
     return [mapping[element] for element in stdf_value]
 
+# ATDF text of the nibble values 0-15 (same as hex(x)[2:].upper())
+NIBBLE_TEXT = tuple('0123456789ABCDEF')
+
 def format_states_array(stdf_value):
+    if isinstance(stdf_value, np.ndarray):
+        # xN*1 nibbles decoded into a numpy array
+        return [NIBBLE_TEXT[x] for x in stdf_value.tolist()]
     if isinstance(stdf_value, (list, tuple)) and all(isinstance(x, int) for x in stdf_value):
         return [hex(x)[2:].upper() if x >= 10 else str(x) for x in stdf_value]
 
@@ -180,6 +242,9 @@ def format_states_array(stdf_value):
 def format_default_value(stdf_value): # Renamed from process_default_value
     if stdf_value is None:
         return None
+    elif isinstance(stdf_value, np.ndarray):
+        # Python ints/floats print like the values struct used to return (str(np.float32) would not)
+        return list(map(str, stdf_value.tolist()))
     elif isinstance(stdf_value, (list, tuple)):
         return list(map(str, stdf_value))
     return stdf_value
@@ -0,0 +1,131 @@
+# src/core/atdf_generator/mappings.py
+"""
+Compiles the STDF to ATDF field mapping of every record type into a plan.
+
+A plan is a flat list of (atdf_field, getter, formatter) steps built once from
+ATDF_TEMPLATES and ATDF_FIELD_FORMATTERS. The getter reads the referenced STDF
+value(s) by position from the decoded value tuple of a record (see
+stdf_parser.schema), the formatter turns them into the ATDF value. No template
+dict is read or written per record.
+"""
+import logging
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from .formatters import * # Import all formatting functions
+from .templates import ATDF_TEMPLATES
+from ..stdf_parser.schema import STDF_SCHEMAS
+
+logger = logging.getLogger(__name__)
+
+# Formatters for ATDF fields that need more than format_default_value, by (ATDF field, record type).
+# Fields mapped from several STDF fields receive the list of their values.
+ATDF_FIELD_FORMATTERS = {
+    ('pass_fail_flag', 'PTR'): format_pass_fail_flag,
+    ('pass_fail_flag', 'MPR'): format_pass_fail_flag,
+    ('alarm_flags', 'PTR'): format_alarm_flags,
+    ('alarm_flags', 'MPR'): format_alarm_flags,
+    ('programmed_state', 'PLR'): format_state_field,
+    ('returned_state', 'PLR'): format_state_field,
+    ('data_file_type', 'FAR'): format_data_file_type,
+    ('pass_fail_code', 'PRR'): format_pass_fail_code,
+    ('retest_code', 'PRR'): format_retest_code,
+    ('abort_code', 'PRR'): format_abort_code,
+    ('head_number', 'PCR'): format_head_or_site_number,
+    ('head_number', 'HBR'): format_head_or_site_number,
+    ('head_number', 'SBR'): format_head_or_site_number,
+    ('head_number', 'TSR'): format_head_or_site_number,
+    ('site_number', 'PCR'): format_head_or_site_number,
+    ('site_number', 'HBR'): format_head_or_site_number,
+    ('site_number', 'SBR'): format_head_or_site_number,
+    ('site_number', 'TSR'): format_head_or_site_number,
+    ('limit_compare', 'PTR'): format_limit_compare,
+    ('limit_compare', 'MPR'): format_limit_compare,
+    ('pass_fail_flag', 'FTR'): format_ftr_pass_fail_flag,
+    ('alarm_flags', 'FTR'): format_ftr_alarm_flags,
+    ('relative_address', 'FTR'): format_ftr_relative_address,
+    ('generic_data', 'GDR'): format_generic_data,
+    ('mode_array', 'PLR'): format_mode_array,
+    ('radix_array', 'PLR'): format_radix_array,
+    ('states_array', 'MPR'): format_states_array
+}
+
+# ATDF version written to FAR records
+ATDF_VERSION = 2
+
+MappingStep = Tuple[str, Callable[[Sequence[Any]], Any], Callable[[Any], Any]]
+
+
+def _constant(value: Any) -> Callable[[Any], Any]:
+    return lambda _: value
+
+
+def _make_single_getter(position: int) -> Callable[[Sequence[Any]], Any]:
+    """Getter returning the value of one STDF field (None if omitted from a truncated record)."""
+    return lambda values: values[position] if position < len(values) else None
+
+
+def _make_multi_getter(positions: List[int]) -> Callable[[Sequence[Any]], List[Any]]:
+    """Getter returning the values of several STDF fields as a list (None for omitted fields)."""
+    def get_values(values):
+        value_count = len(values)
+        return [values[position] if position < value_count else None for position in positions]
+    return get_values
+
+
+def compile_atdf_mapping(record_type: str) -> List[MappingStep]:
+    """Compile the mapping of record_type into a list of (atdf_field, getter, formatter) steps."""
+    if record_type not in ATDF_TEMPLATES:
+        raise ValueError(f"No template found for ATDF record type {record_type}")
+    schema = STDF_SCHEMAS.get(record_type)
+    stdf_fields = schema.field_index if schema else {}
+
+    steps: List[MappingStep] = []
+    for atdf_field, atdf_info in ATDF_TEMPLATES[record_type].items():
+        stdf_ref = atdf_info.get('stdf')
+        formatter = ATDF_FIELD_FORMATTERS.get((atdf_field, record_type))
+        refs = list(stdf_ref) if isinstance(stdf_ref, (list, tuple)) else [stdf_ref] if stdf_ref else []
+        for ref in refs:
+            if ref not in stdf_fields:
+                raise ValueError(f"STDF field '{ref}' referenced by ATDF field {atdf_field} "
+                                 f"not found in record {record_type}")
+
+        if isinstance(stdf_ref, (list, tuple)):
+            # Several STDF fields map to one ATDF field; only defined through a formatter
+            if formatter is None:
+                logger.debug(f"No specific formatter found for list/tuple input {stdf_ref} for {atdf_field} in {record_type}")
+                steps.append((atdf_field, _constant(None), _constant(None)))
+            else:
+                steps.append((atdf_field, _make_multi_getter([stdf_fields[ref] for ref in refs]), formatter))
+        elif isinstance(stdf_ref, str):
+            # Single STDF field mapping
+            steps.append((atdf_field, _make_single_getter(stdf_fields[stdf_ref]),
+                          formatter or format_default_value))
+        elif atdf_field == 'atdf_version' and record_type == 'FAR':
+            steps.append((atdf_field, _constant(None), _constant(ATDF_VERSION)))
+        else:
+            steps.append((atdf_field, _constant(None), _constant(None)))
+    return steps
+
+
+# Compiled once at import time.
+ATDF_MAPPINGS = {record_type: compile_atdf_mapping(record_type) for record_type in ATDF_TEMPLATES}
+
+
+def map_stdf_to_atdf(record_type: str, stdf_values: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Build the ATDF entry of a record from its decoded STDF value tuple.
+    A formatter raising KeyError (e.g. an unknown radix code) yields None for that field.
+    """
+    try:
+        steps = ATDF_MAPPINGS[record_type]
+    except KeyError:
+        raise ValueError(f"No ATDF mapping found for record type {record_type}")
+
+    atdf_entry = {}
+    for atdf_field, getter, formatter in steps:
+        try:
+            atdf_entry[atdf_field] = formatter(getter(stdf_values))
+        except KeyError as e:
+            logger.warning(f"Missing STDF field {e} referenced by ATDF field {atdf_field} in {record_type}")
+            atdf_entry[atdf_field] = None
+    return atdf_entry
@@ -0,0 +1,154 @@
+# src/core/atdf_generator/writers.py
+"""
+Compiles ATDF_TEMPLATES into one line formatter per record type.
+
+Field order, required flags and the value formatter of every field are resolved
+once when the module is imported. Formatting a record is then a single pass over
+its values and one '|'.join, producing exactly the line write_atdf_file used to
+write field by field.
+"""
+import logging
+from typing import Any, Callable, Dict, List
+
+from .formatters import format_atdf_datetime_from_epoch
+from .templates import ATDF_TEMPLATES
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FIELDS = {'modification_timestamp', 'setup_time', 'start_time', 'finish_time'}
+TIMESTAMP_RECORD_TYPES = {'ATR', 'MIR', 'MRR', 'WIR', 'WRR'}
+
+# (field name, record type) pairs with a special array layout in _format_value_for_atdf_text
+SPECIAL_ARRAY_FIELDS = {
+    ('PROGRAMMED_STATE', 'PLR'),
+    ('RETURNED_STATE', 'PLR'),
+    ('GENERIC_DATA', 'GDR'),
+    ('MODE_ARRAY', 'PLR'),
+    ('RADIX_ARRAY', 'PLR'),
+    ('STATES_ARRAY', 'MPR'),
+}
+
+ValueFormatter = Callable[[Any], str]
+
+
+def _format_default(value: Any) -> str:
+    """Default ATDF text for a value: empty for None, comma-joined lists, str() otherwise."""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ','.join(map(str, value))
+    return str(value)
+
+
+def _format_timestamp(value: Any) -> str:
+    """Epoch seconds as an ATDF date; values that are not ints are formatted as usual."""
+    if isinstance(value, int):
+        # format_atdf_datetime_from_epoch logs its own errors and returns None on failure
+        return format_atdf_datetime_from_epoch(value) or ""
+    return _format_default(value)
+
+
+# Helper function to format values for ATDF text output based on field type (moved from handler.py)
+def _format_value_for_atdf_text(field_name: str, value: Any, record_type: str) -> str:
+    """
+    Formats a Python value (potentially list or list of lists) into the
+    correct string representation for the ATDF text file based on field name.
+    """
+    if value is None:
+        return ""
+
+    # Handle specific array formats based on field name and record type
+    if field_name == 'PROGRAMMED_STATE' and record_type == 'PLR':
+        if isinstance(value, (list, tuple)) and all(isinstance(sublist, (list, tuple)) for sublist in value):
+            # List of lists format: inner comma, outer slash
+            group_strings = [','.join(map(str, group)) for group in value]
+            return '/'.join(group_strings)
+    elif field_name == 'RETURNED_STATE' and record_type == 'PLR':
+         if isinstance(value, (list, tuple)) and all(isinstance(sublist, (list, tuple)) for sublist in value):
+            # List of lists format: inner comma, outer slash
+            group_strings = [','.join(map(str, group)) for group in value]
+            return '/'.join(group_strings)
+    elif field_name == 'GENERIC_DATA' and record_type == 'GDR':
+        if isinstance(value, (list, tuple)):
+            # Simple list format: pipe separator
+            return '|'.join(map(str, value))
+    elif field_name == 'MODE_ARRAY' and record_type == 'PLR':
+         if isinstance(value, (list, tuple)):
+            # Simple list format: comma separator
+            return ','.join(map(str, value))
+    elif field_name == 'RADIX_ARRAY' and record_type == 'PLR':
+         if isinstance(value, (list, tuple)):
+            # Simple list format: comma separator
+            return ','.join(map(str, value))
+    elif field_name == 'STATES_ARRAY' and record_type == 'MPR':
+         if isinstance(value, (list, tuple)):
+            # Simple list format: comma separator
+            return ','.join(map(str, value))
+    # Add other specific array/list formats here as needed
+
+    # Default handling for scalar types or lists that don't need special joining
+    # This will catch lists from format_default_value for example, joining with comma
+    if isinstance(value, (list, tuple)):
+         return ','.join(map(str, value))
+
+    # Default string conversion for all other types (int, float, bool, str)
+    return str(value)
+
+
+def _get_value_formatter(field_name: str, record_type: str) -> ValueFormatter:
+    """Select the formatter of a field once, instead of testing its name for every value."""
+    if field_name in TIMESTAMP_FIELDS and record_type in TIMESTAMP_RECORD_TYPES:
+        return _format_timestamp
+    if (field_name, record_type) in SPECIAL_ARRAY_FIELDS:
+        return lambda value: _format_value_for_atdf_text(field_name, value, record_type)
+    return _format_default
+
+
+def compile_atdf_writer(record_type: str) -> Callable[[Dict[str, Any]], str]:
+    """
+    Compile the ATDF template of record_type into a function that formats an ATDF
+    entry as one complete ATDF line (header, '|'-separated fields, newline).
+
+    Trailing fields are omitted as long as they are optional and None or empty.
+    """
+    if record_type not in ATDF_TEMPLATES:
+        raise ValueError(f"No template found for ATDF record type {record_type}")
+
+    header = f"{record_type}:"
+    fields = ATDF_TEMPLATES[record_type]
+    names: List[str] = list(fields)
+    formatters: List[ValueFormatter] = [_get_value_formatter(name, record_type) for name in names]
+    # Fields up to the last required field are always written
+    last_required = max((i for i, name in enumerate(names) if fields[name].get('req', False)), default=-1)
+    empty_line = header + "\n"
+
+    if not names:
+        return lambda entry: empty_line
+
+    def format_record(entry: Dict[str, Any]) -> str:
+        get = entry.get
+        values = [get(name) for name in names]
+        last = len(values) - 1
+        while last > last_required:
+            value = values[last]
+            if value is not None and value != "":
+                break
+            last -= 1
+        if last < 0:
+            return empty_line
+        return header + '|'.join([formatters[i](values[i]) for i in range(last + 1)]) + "\n"
+
+    format_record.__name__ = f"format_{record_type}"
+    return format_record
+
+
+# Compiled once at import time.
+ATDF_WRITERS = {record_type: compile_atdf_writer(record_type) for record_type in ATDF_TEMPLATES}
+
+
+def get_atdf_writer(record_type: str) -> Callable[[Dict[str, Any]], str]:
+    """Return the precompiled ATDF line formatter for record_type."""
+    try:
+        return ATDF_WRITERS[record_type]
+    except KeyError:
+        raise ValueError(f"No ATDF writer found for record type {record_type}")
@@ -2,113 +2,132 @@
 """
 Handles the enrichment of processed records with hierarchical IDs (w_id, p_id).
 Logic moved from src/core/atdf/handler.py.
+
+The ids of the latest WIR and PIR are kept in an IdEnrichmentState that is updated
+as records stream by, so every lookup is a dictionary access and the records
+processed before do not need to be kept.
 """
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
-# Helper function moved from src/core/atdf/handler.py
-def _find_latest_parent_record(
-    record_type_to_find: str,
-    all_processed_entries: Dict[str, List[Dict[str, Any]]],
-    current_head_num: Optional[int],
-    current_site_num: Optional[int]
-) -> Optional[Dict[str, Any]]:
+
+class _LatestParentIds:
     """
-    Helper to find the most recent parent record (e.g., WIR or PIR)
-    matching head and site numbers if available.
-    Searches in reverse order.
+    Latest id of one parent record type (WIR or PIR), indexed the same ways a
+    record can ask for it: by (head, site), by head only, by site only, or overall.
+    A record without head or site number matches a parent with any value for it.
     """
-    if record_type_to_find not in all_processed_entries or not all_processed_entries[record_type_to_find]:
-        return None
-    
-    for parent_entry in reversed(all_processed_entries[record_type_to_find]):
-        parent_head_num = parent_entry.get('head_number') 
-        parent_site_num = parent_entry.get('site_number') 
-
-        # More robust matching: if current has context, parent must match. If current lacks, parent can lack.
-        if current_head_num is not None and parent_head_num != current_head_num:
-            continue
-        if current_site_num is not None and parent_site_num != current_site_num:
-            continue
-            
-        return parent_entry
-    return None
+    __slots__ = ('by_head_site', 'by_head', 'by_site', 'latest')
+
+    def __init__(self):
+        self.by_head_site: Dict[Tuple[Any, Any], int] = {}
+        self.by_head: Dict[Any, int] = {}
+        self.by_site: Dict[Any, int] = {}
+        self.latest: Optional[int] = None
+
+    def update(self, head_num: Any, site_num: Any, parent_id: int) -> None:
+        self.by_head_site[(head_num, site_num)] = parent_id
+        self.by_head[head_num] = parent_id
+        self.by_site[site_num] = parent_id
+        self.latest = parent_id
+
+    def find(self, head_num: Any, site_num: Any) -> Optional[int]:
+        """Return the id of the latest parent matching head and site numbers if available."""
+        if head_num is not None:
+            if site_num is not None:
+                return self.by_head_site.get((head_num, site_num))
+            return self.by_head.get(head_num)
+        if site_num is not None:
+            return self.by_site.get(site_num)
+        return self.latest
+
+
+class IdEnrichmentState:
+    """Per-file state of the id enrichment: id counters and the latest WIR/PIR ids."""
+    __slots__ = ('w_counter', 'p_counter', 'wafers', 'parts')
+
+    def __init__(self):
+        self.w_counter = 0
+        self.p_counter = 0
+        self.wafers = _LatestParentIds()
+        self.parts = _LatestParentIds()
+
+    def find_w_id(self, head_num: Any, site_num: Any) -> Optional[int]:
+        """w_id of the latest WIR matching head/site, falling back to the absolute latest WIR."""
+        w_id = self.wafers.find(head_num, site_num)
+        if w_id is None: # Fallback if context-specific fails
+            w_id = self.wafers.latest
+        return w_id
+
 
 # Function moved from src/core/atdf/handler.py
 def add_hierarchical_ids(
     record_type: str,
     current_entry_dict: Dict[str, Any],
-    all_processed_entries: Dict[str, List[Dict[str, Any]]], # This is the collection of lists of dicts for the current file
-    counters: Dict[str, int]
+    state: IdEnrichmentState
 ) -> Dict[str, Any]:
     """
     Adds w_id and p_id keys ONLY WHEN APPLICABLE based on record type and context,
     with fallback for w_id assignment to PIR/PRR/WRR.
     Ensures WIR/WRR do not have p_id key, and PTR/MPR/FTR do not have w_id key.
+    Records must be passed in file order; state is updated for WIR and PIR.
     Modifies current_entry_dict in place and returns it.
     """
     current_head_num = current_entry_dict.get('head_number')
     current_site_num = current_entry_dict.get('site_number')
-    
+
     # Do NOT initialize keys here. Add them only when assigned.
 
     if record_type == 'WIR':
-        counters['w_counter'] += 1
-        current_entry_dict['w_id'] = counters['w_counter']
+        state.w_counter += 1
+        current_entry_dict['w_id'] = state.w_counter
+        state.wafers.update(current_head_num, current_site_num, state.w_counter)
         # No p_id key added
-        
+
     elif record_type == 'WRR':
         # Assign w_id from latest relevant WIR (with fallback)
-        latest_wir = _find_latest_parent_record('WIR', all_processed_entries, current_head_num, current_site_num)
-        if not latest_wir: # Fallback if context-specific fails
-             latest_wir = _find_latest_parent_record('WIR', all_processed_entries, None, None) # Find absolute latest
-             
-        if latest_wir and 'w_id' in latest_wir:
-            current_entry_dict['w_id'] = latest_wir['w_id'] # Add w_id key
+        w_id = state.find_w_id(current_head_num, current_site_num)
+        if w_id is not None:
+            current_entry_dict['w_id'] = w_id # Add w_id key
         else:
             logger.debug(f"WRR record could not find any WIR for w_id. Head: {current_head_num}, Site: {current_site_num}")
         # No p_id key added
 
     elif record_type == 'PIR':
-        counters['p_counter'] += 1
-        current_entry_dict['p_id'] = counters['p_counter'] # Add p_id key
+        state.p_counter += 1
+        current_entry_dict['p_id'] = state.p_counter # Add p_id key
+        state.parts.update(current_head_num, current_site_num, state.p_counter)
         # Assign w_id from latest relevant WIR (with fallback)
-        latest_wir = _find_latest_parent_record('WIR', all_processed_entries, current_head_num, current_site_num)
-        if not latest_wir: # Fallback if context-specific fails
-             latest_wir = _find_latest_parent_record('WIR', all_processed_entries, None, None) # Find absolute latest
-             
-        if latest_wir and 'w_id' in latest_wir:
-            current_entry_dict['w_id'] = latest_wir['w_id'] # Add w_id key
+        w_id = state.find_w_id(current_head_num, current_site_num)
+        if w_id is not None:
+            current_entry_dict['w_id'] = w_id # Add w_id key
         else:
             logger.debug(f"PIR record could not find any WIR for w_id. Head: {current_head_num}, Site: {current_site_num}")
 
     elif record_type == 'PRR':
         # Assign p_id from latest relevant PIR
-        latest_pir = _find_latest_parent_record('PIR', all_processed_entries, current_head_num, current_site_num)
-        if latest_pir and 'p_id' in latest_pir:
-            current_entry_dict['p_id'] = latest_pir['p_id'] # Add p_id key
+        p_id = state.parts.find(current_head_num, current_site_num)
+        if p_id is not None:
+            current_entry_dict['p_id'] = p_id # Add p_id key
         else:
             logger.debug(f"PRR record could not find a PIR for p_id. Head: {current_head_num}, Site: {current_site_num}")
-            
+
         # Assign w_id from latest relevant WIR (with fallback)
-        latest_wir = _find_latest_parent_record('WIR', all_processed_entries, current_head_num, current_site_num)
-        if not latest_wir: # Fallback if context-specific fails
-             latest_wir = _find_latest_parent_record('WIR', all_processed_entries, None, None) # Find absolute latest
-             
-        if latest_wir and 'w_id' in latest_wir:
-            current_entry_dict['w_id'] = latest_wir['w_id'] # Add w_id key
+        w_id = state.find_w_id(current_head_num, current_site_num)
+        if w_id is not None:
+            current_entry_dict['w_id'] = w_id # Add w_id key
         else:
             logger.debug(f"PRR record could not find any WIR for w_id. Head: {current_head_num}, Site: {current_site_num}")
 
     elif record_type in ['PTR', 'MPR', 'FTR']:
         # Assign p_id from latest relevant PIR
-        latest_pir = _find_latest_parent_record('PIR', all_processed_entries, current_head_num, current_site_num)
-        if latest_pir and 'p_id' in latest_pir:
-            current_entry_dict['p_id'] = latest_pir['p_id'] # Add p_id key
+        p_id = state.parts.find(current_head_num, current_site_num)
+        if p_id is not None:
+            current_entry_dict['p_id'] = p_id # Add p_id key
         else:
             logger.debug(f"{record_type} record could not find a PIR for p_id. Head: {current_head_num}, Site: {current_site_num}")
         # No w_id key added
-            
-    return current_entry_dict
\ No newline at end of file
+
+    return current_entry_dict
@@ -1,6 +1,12 @@
 # src/core/data_transformers/record_modifiers/advantest_modifier.py
 # Moved from src/core/atdf/modifiers/advantest.py
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+
+# Fields rewritten or added, per record type; the modifier is not called for other record types
+ADVANTEST_MODIFIED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    'MIR': ('tester_type',),
+    'SDR': ('handler_type',),
+}
 
 def process_advantest(record_type: str, record_data: Dict[str, Any]) -> Dict[str, Any]:
     """
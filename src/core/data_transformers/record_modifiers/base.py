@@ -1,15 +1,90 @@
 # src/core/data_transformers/record_modifiers/base.py
 # Moved from src/core/atdf/modifiers/base.py # Updated to reflect terminology change
+"""
+Registry of record modifiers.
 
-from typing import Dict, Any, Optional
+A modifier is either registered here by name (the vendor modifiers) or
+described by a rule file (see rule_modifier.py), selected by its path. Each
+modifier declares the fields it rewrites or adds per record type
+(modified_fields). A conversion resolves its modifier once per file, and
+records of the other record types skip the modifier entirely: no call and
+no copy of the entry.
+"""
+
+from typing import Dict, Any, Callable, List, NamedTuple, Optional, Tuple
 import logging
-# Imports will need adjustment after specific modifiers are moved and renamed
-from .advantest_modifier import process_advantest # Placeholder name adjustment
-from .teradyne_modifier import process_teradyne # Placeholder name adjustment
-from .eagle_modifier import process_eagle # Placeholder name adjustment
+from .advantest_modifier import process_advantest, ADVANTEST_MODIFIED_FIELDS
+from .teradyne_modifier import process_teradyne, TERADYNE_MODIFIED_FIELDS
+from .eagle_modifier import process_eagle, EAGLE_MODIFIED_FIELDS
+from .rule_modifier import is_rule_file, load_rule_modifier
 
 logger = logging.getLogger(__name__)
 
+ModifierFunction = Callable[[str, Dict[str, Any]], Dict[str, Any]]
+BatchModifierFunction = Callable[[str, List[Dict[str, Any]]], List[Dict[str, Any]]]
+
+
+class RecordModifier(NamedTuple):
+    """A registered modifier: its per-record function and the record types and fields it affects."""
+    name: str
+    function: ModifierFunction # (record_type, record_data) -> modified record_data
+    modified_fields: Dict[str, Tuple[str, ...]] # Record type -> fields rewritten or added
+    batch_function: Optional[BatchModifierFunction] = None # (record_type, entries) -> modified entries
+
+    def applies_to(self, record_type: str) -> bool:
+        return record_type in self.modified_fields
+
+
+# Modifier name (e.g. 'advantest') -> RecordModifier
+MODIFIERS: Dict[str, RecordModifier] = {}
+
+
+def register_modifier(name: str, function: ModifierFunction, modified_fields: Dict[str, Tuple[str, ...]],
+                      batch_function: Optional[BatchModifierFunction] = None) -> RecordModifier:
+    """
+    Register a modifier under a name.
+    function is only called for the record types in modified_fields. batch_function, if given,
+    rewrites a list of entries of one record type at once (see apply_modifier_batch); the
+    pipelined conversion uses it once per record type and batch of records.
+    """
+    modifier = RecordModifier(name, function, dict(modified_fields), batch_function)
+    MODIFIERS[name] = modifier
+    return modifier
+
+
+register_modifier('advantest', process_advantest, ADVANTEST_MODIFIED_FIELDS)
+register_modifier('teradyne', process_teradyne, TERADYNE_MODIFIED_FIELDS)
+register_modifier('eagle', process_eagle, EAGLE_MODIFIED_FIELDS)
+
+
+def get_record_modifier(modifier_type: Optional[str]) -> Optional[RecordModifier]:
+    """
+    Return the modifier of a registered name or of a rule file path (.json, .toml, .yaml/.yml),
+    None if modifier_type is empty. Rule files are compiled once per process.
+    Raises ValueError for unknown names and for rule files that cannot be loaded or compiled.
+    """
+    if not modifier_type:
+        return None
+    if modifier_type in MODIFIERS:
+        return MODIFIERS[modifier_type]
+    if is_rule_file(modifier_type):
+        rule_modifier = load_rule_modifier(modifier_type)
+        return RecordModifier(rule_modifier.name, rule_modifier.modify,
+                              rule_modifier.modified_fields, rule_modifier.modify_batch)
+    raise ValueError(f"Unknown modifier type: {modifier_type}")
+
+
+def apply_modifier(modifier: RecordModifier, record_type: str, record_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply a modifier to one record of a record type it affects (the caller checks applies_to).
+    The modifier may change record_data in place. Errors are logged and record_data is returned.
+    """
+    try:
+        return modifier.function(record_type, record_data)
+    except Exception as e: # Catch potential errors during modification itself
+        logger.error(f"Unexpected error during record modification for type {modifier.name}: {str(e)}")
+        return record_data
+
 
 def modify_record(record_type: str, record_data: Dict[str, Any], # Renamed function
                   modifier_type: Optional[str] = None) -> Dict[str, Any]: # Renamed parameter
@@ -22,37 +97,52 @@ def modify_record(record_type: str, record_data: Dict[str, Any], # Renamed funct
         modifier_type: String identifier for which record modifier to use # Updated parameter name and description
 
     Returns:
-        Modified record_data dictionary
+        Modified record_data dictionary (record_data itself if the modifier does not affect the record type)
     """
-    if not modifier_type: # Renamed variable
-        return record_data
-
     try:
-        modifier_function = get_modifier(modifier_type) # Use renamed variable
-        return modifier_function(record_type, record_data)
-    except ValueError as e: # Catching ValueError specifically as raised by get_modifier
+        modifier = get_record_modifier(modifier_type)
+    except ValueError as e: # Raised by get_record_modifier for unknown names
         logger.error(f"Error during record modification: {str(e)}")
-        # Reraise or handle as appropriate, for now, returning original data
-        # Or, more robustly, raise a custom exception or the original one:
-        # raise ValueError(f"Unknown modifier type: {modifier_type}") from e
-        return record_data # Or re-raise e
-    except Exception as e: # Catch other potential errors during modification itself
-        logger.error(f"Unexpected error during record modification for type {modifier_type}: {str(e)}")
         return record_data
+    if modifier is None or not modifier.applies_to(record_type):
+        return record_data
+    return apply_modifier(modifier, record_type, record_data)
 
 
-def get_modifier(modifier_type: str): # Renamed from get_preprocessor
+def apply_modifier_batch(modifier: RecordModifier, record_type: str,
+                         entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    Factory function to get the appropriate modifier based on type.
+    Batched apply_modifier: apply a modifier to entries of one record type it affects, through its
+    batch_function if it has one. Copies of the entries are modified, so if batch_function fails,
+    the error is logged and the entries are modified one by one instead, as apply_modifier would.
     """
-    # Map uses modifier type string identifiers (e.g., 'advantest') as keys.
-    modifiers = {
-        'advantest': process_advantest,
-        'teradyne': process_teradyne,
-        'eagle': process_eagle
-    }
+    if modifier.batch_function is None:
+        return [apply_modifier(modifier, record_type, entry.copy()) for entry in entries]
+    try:
+        return modifier.batch_function(record_type, [entry.copy() for entry in entries])
+    except Exception as e:
+        logger.error(f"Unexpected error during batch record modification for type {modifier.name}: {str(e)}")
+    return [apply_modifier(modifier, record_type, entry.copy()) for entry in entries]
 
-    if modifier_type not in modifiers:
-        raise ValueError(f"Unknown modifier type: {modifier_type}")
 
-    return modifiers[modifier_type]
\ No newline at end of file
+def modify_records(record_type: str, entries: List[Dict[str, Any]],
+                   modifier_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Batched modify_record: apply a modifier to a list of entries of one record type.
+    The list is returned as is if the modifier does not affect the record type; otherwise
+    modified copies of the entries are returned (see apply_modifier_batch).
+    """
+    modifier = get_record_modifier(modifier_type)
+    if modifier is None or not modifier.applies_to(record_type):
+        return entries
+    return apply_modifier_batch(modifier, record_type, entries)
+
+
+def get_modifier(modifier_type: str) -> ModifierFunction: # Renamed from get_preprocessor
+    """
+    Factory function to get the modifier function of a registered modifier type.
+    """
+    modifier = get_record_modifier(modifier_type)
+    if modifier is None:
+        raise ValueError(f"Unknown modifier type: {modifier_type}")
+    return modifier.function
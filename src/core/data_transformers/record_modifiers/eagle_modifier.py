@@ -1,6 +1,11 @@
 # src/core/data_transformers/record_modifiers/eagle_modifier.py
 # Moved from src/core/atdf/modifiers/eagle.py
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+
+# Fields rewritten or added, per record type; the modifier is not called for other record types
+EAGLE_MODIFIED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    'MIR': ('lot_id', 'eagle_system', 'probe_card'),
+}
 
 def process_eagle(record_type: str, record_data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -0,0 +1,298 @@
+# src/core/data_transformers/record_modifiers/rule_modifier.py
+"""
+Record modifiers described by a rule file instead of Python code.
+
+A rule file (JSON, TOML, or YAML if PyYAML is installed) lists rules per
+record type under 'records'. Each rule names a field and one operation, and
+may have a condition:
+
+    name = "fab7"
+
+    [[records.MIR]]
+    field = "tester_type"
+    set = "V93000"                          # Set the field
+
+    [[records.MIR]]
+    field = "fab_site"
+    set = "FAB7"
+    add = true                              # 'set' on a field the record type does not have
+
+    [[records.SDR]]
+    field = "handler_type"
+    prefix = "ADV_"                         # Also: suffix = "..."
+
+    [[records.MIR]]
+    field = "lot_id"
+    regex = '^(\\w+)-\\d+$'                 # re.sub; the value is not changed if it does not match
+    replace = '\\1'
+
+    [[records.MIR]]
+    field = "job_name"
+    case = "upper"                          # Or "lower"
+
+    [[records.MIR]]
+    field = "node_id"
+    map = { "TST01" = "FAB7-01" }           # Values not in the map are kept, unless 'default' is given
+
+    [[records.PRR]]
+    field = "hardware_bin"
+    set = 99
+    when = { field = "software_bin", in = [5, 6] }   # Also: equals, matches (regex), present (true/false)
+
+Rules run in file order. Except for 'set', operations leave missing and None
+values alone, and work on str(value) for values that are not strings. Rules
+and conditions must name an ATDF field of the record type or a field added by
+an earlier rule, so that a misspelled field is an error instead of a rule that
+silently does nothing (or adds a bogus field). Only 'set' with 'add = true' may
+add a field the record type does not have. w_id and p_id are assigned after the
+modifiers run, so rules cannot test or rewrite them. The file
+is checked and compiled once into one tuple of closures per record type; a
+record is then modified by calling the closures of its record type, without
+reading the rules again.
+"""
+import json
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import AbstractSet, Any, Callable, Dict, List, Tuple
+
+from ...atdf_generator.templates import ATDF_TEMPLATES
+
+logger = logging.getLogger(__name__)
+
+RuleAction = Callable[[Dict[str, Any]], None] # Changes the entry in place
+
+RULE_OPERATIONS = ('set', 'prefix', 'suffix', 'regex', 'case', 'map')
+CONDITION_TESTS = ('equals', 'in', 'matches', 'present')
+CASE_FUNCTIONS = {'upper': str.upper, 'lower': str.lower}
+# Added by ID enrichment, after the modifiers
+ID_FIELDS = ('w_id', 'p_id')
+
+
+def _load_json(path: Path) -> Any:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _load_toml(path: Path) -> Any:
+    import tomllib # Python 3.11+
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def _load_yaml(path: Path) -> Any:
+    import yaml # Optional dependency (PyYAML)
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+# File suffix -> loader
+RULE_FILE_LOADERS = {
+    '.json': _load_json,
+    '.toml': _load_toml,
+    '.yaml': _load_yaml,
+    '.yml': _load_yaml,
+}
+
+
+def is_rule_file(modifier_type: str) -> bool:
+    """Whether a --modifier value names a rule file (by its suffix) rather than a registered modifier."""
+    return Path(modifier_type).suffix.lower() in RULE_FILE_LOADERS
+
+
+def load_rules(path: str) -> Dict[str, Any]:
+    """Read a rule file. Raises ValueError if it cannot be read or parsed."""
+    rule_path = Path(path)
+    loader = RULE_FILE_LOADERS.get(rule_path.suffix.lower())
+    if loader is None:
+        raise ValueError(f"Unsupported rule file type '{rule_path.suffix}' for {path}; "
+                         f"expected one of {', '.join(RULE_FILE_LOADERS)}")
+    try:
+        rules = loader(rule_path)
+    except ImportError:
+        raise ValueError(f"Rule file {path} is YAML, which needs PyYAML (pip install pyyaml); "
+                         f"use a JSON or TOML rule file instead")
+    except OSError as e:
+        raise ValueError(f"Cannot read rule file {path}: {e}")
+    except Exception as e: # Parser errors (json, tomllib, yaml)
+        raise ValueError(f"Cannot parse rule file {path}: {e}")
+    if not isinstance(rules, dict):
+        raise ValueError(f"Rule file {path} must contain a table/object at the top level")
+    return rules
+
+
+def _as_text(value: Any) -> str:
+    return value if isinstance(value, str) else str(value)
+
+
+def _check_field(field: str, known_fields: AbstractSet[str], where: str, hint: str = '') -> None:
+    """Reject a field that records of the rule's record type do not have when the rules run."""
+    if field in known_fields:
+        return
+    if field in ID_FIELDS:
+        raise ValueError(f"{where}: '{field}' is assigned after the modifiers run and cannot be used in rules")
+    raise ValueError(f"{where}: unknown field '{field}'; expected an ATDF field of the record type "
+                     f"or a field added by an earlier rule{hint}")
+
+
+def _compile_condition(condition: Any, where: str,
+                       known_fields: AbstractSet[str]) -> Callable[[Dict[str, Any]], bool]:
+    if not isinstance(condition, dict) or not isinstance(condition.get('field'), str):
+        raise ValueError(f"{where}: 'when' must be a table with a 'field'")
+    tests = [test for test in CONDITION_TESTS if test in condition]
+    unknown = set(condition) - set(CONDITION_TESTS) - {'field'}
+    if len(tests) != 1 or unknown:
+        raise ValueError(f"{where}: 'when' needs exactly one of {', '.join(CONDITION_TESTS)}")
+    field, test = condition['field'], tests[0]
+    _check_field(field, known_fields, f"{where}: 'when'")
+    expected = condition[test]
+
+    if test == 'equals':
+        return lambda entry: entry.get(field) == expected
+    if test == 'in':
+        if not isinstance(expected, list):
+            raise ValueError(f"{where}: 'in' must be a list")
+        expected_values = tuple(expected)
+        return lambda entry: entry.get(field) in expected_values
+    if test == 'matches':
+        pattern = _compile_regex(expected, where)
+        return lambda entry: (value := entry.get(field)) is not None and pattern.search(_as_text(value)) is not None
+    present = bool(expected)
+    return lambda entry: (entry.get(field) is not None) == present
+
+
+def _compile_regex(pattern: Any, where: str) -> re.Pattern:
+    if not isinstance(pattern, str):
+        raise ValueError(f"{where}: regular expression must be a string")
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"{where}: invalid regular expression '{pattern}': {e}")
+
+
+def _compile_transform(rule: Dict[str, Any], operation: str, where: str) -> Callable[[Any], Any]:
+    """The value transformation of an operation other than 'set'."""
+    argument = rule[operation]
+    if operation == 'prefix':
+        prefix = _as_text(argument)
+        return lambda value: prefix + _as_text(value)
+    if operation == 'suffix':
+        suffix = _as_text(argument)
+        return lambda value: _as_text(value) + suffix
+    if operation == 'regex':
+        pattern = _compile_regex(argument, where)
+        replacement = rule.get('replace')
+        if not isinstance(replacement, str):
+            raise ValueError(f"{where}: 'regex' needs a 'replace' string")
+        return lambda value: pattern.sub(replacement, _as_text(value))
+    if operation == 'case':
+        case_function = CASE_FUNCTIONS.get(argument)
+        if case_function is None:
+            raise ValueError(f"{where}: 'case' must be one of {', '.join(CASE_FUNCTIONS)}")
+        return lambda value: case_function(_as_text(value))
+    # map
+    if not isinstance(argument, dict):
+        raise ValueError(f"{where}: 'map' must be a table")
+    mapping = dict(argument)
+    if 'default' in rule:
+        default = rule['default']
+        return lambda value: mapping.get(_as_text(value), default)
+    return lambda value: mapping.get(_as_text(value), value)
+
+
+def compile_rule(rule: Any, where: str, known_fields: AbstractSet[str]) -> Tuple[str, RuleAction]:
+    """
+    Compile one rule into (field, action). known_fields are the fields the entry has when the
+    rule runs (ATDF fields of the record type and fields set by earlier rules).
+    Raises ValueError describing the problem.
+    """
+    if not isinstance(rule, dict) or not isinstance(rule.get('field'), str):
+        raise ValueError(f"{where}: a rule must be a table with a 'field'")
+    operations = [operation for operation in RULE_OPERATIONS if operation in rule]
+    if len(operations) != 1:
+        raise ValueError(f"{where}: a rule needs exactly one of {', '.join(RULE_OPERATIONS)}")
+    unknown = set(rule) - set(RULE_OPERATIONS) - {'field', 'when', 'replace', 'default', 'add'}
+    if unknown:
+        raise ValueError(f"{where}: unknown rule keys {', '.join(sorted(unknown))}")
+    field, operation = rule['field'], operations[0]
+    add = rule.get('add', False)
+    if not isinstance(add, bool) or (add and operation != 'set'):
+        raise ValueError(f"{where}: 'add' must be true or false, and is only allowed with 'set'")
+    if not add or field in ID_FIELDS:
+        _check_field(field, known_fields, where,
+                     " (use 'add = true' with 'set' to add a field)" if operation == 'set' else '')
+    condition = _compile_condition(rule['when'], where, known_fields) if 'when' in rule else None
+
+    if operation == 'set':
+        new_value = rule['set']
+        def action(entry: Dict[str, Any]) -> None:
+            entry[field] = new_value
+    else:
+        transform = _compile_transform(rule, operation, where)
+        def action(entry: Dict[str, Any]) -> None:
+            value = entry.get(field)
+            if value is not None:
+                entry[field] = transform(value)
+
+    if condition is None:
+        return field, action
+
+    def conditional_action(entry: Dict[str, Any]) -> None:
+        if condition(entry):
+            action(entry)
+    return field, conditional_action
+
+
+class RuleModifier:
+    """A rule file compiled into one tuple of actions per record type."""
+
+    def __init__(self, name: str, rules: Dict[str, Any], source: str = '<rules>'):
+        records = rules.get('records')
+        if not isinstance(records, dict) or not records:
+            raise ValueError(f"{source}: no rules; expected rules per record type under 'records'")
+        self.name = name
+        self.actions: Dict[str, Tuple[RuleAction, ...]] = {}
+        self.modified_fields: Dict[str, Tuple[str, ...]] = {}
+        for record_type, record_rules in records.items():
+            if record_type not in ATDF_TEMPLATES:
+                raise ValueError(f"{source}: unknown record type '{record_type}'")
+            if isinstance(record_rules, dict):
+                record_rules = [record_rules] # A single rule
+            if not isinstance(record_rules, list):
+                raise ValueError(f"{source}: rules of {record_type} must be a list")
+            known_fields = set(ATDF_TEMPLATES[record_type])
+            compiled = []
+            for index, rule in enumerate(record_rules):
+                field, action = compile_rule(rule, f"{source}: {record_type} rule {index + 1}", known_fields)
+                known_fields.add(field) # 'set' with 'add' may add a field that later rules use
+                compiled.append((field, action))
+            self.actions[record_type] = tuple(action for _, action in compiled)
+            self.modified_fields[record_type] = tuple(dict.fromkeys(field for field, _ in compiled))
+
+    def modify(self, record_type: str, record_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Modifier function: apply the rules of the record type to record_data in place."""
+        for action in self.actions.get(record_type, ()):
+            action(record_data)
+        return record_data
+
+    def modify_batch(self, record_type: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Batch modifier function: apply the rules of the record type to every entry, action by action."""
+        for action in self.actions.get(record_type, ()):
+            for entry in entries:
+                action(entry)
+        return entries
+
+
+@lru_cache(maxsize=None)
+def load_rule_modifier(path: str) -> RuleModifier:
+    """
+    Load and compile a rule file (once per process and path). The modifier is named after
+    the file's 'name' entry, or the file name without suffix.
+    """
+    rules = load_rules(path)
+    name = rules.get('name') or Path(path).stem
+    rule_modifier = RuleModifier(str(name), rules, source=path)
+    logger.info(f"Compiled modifier rules '{rule_modifier.name}' from {path} for "
+                f"{', '.join(rule_modifier.modified_fields)}")
+    return rule_modifier
@@ -1,6 +1,11 @@
 # src/core/data_transformers/record_modifiers/teradyne_modifier.py
 # Moved from src/core/atdf/modifiers/teradyne.py
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+
+# Fields rewritten or added, per record type; the modifier is not called for other record types
+TERADYNE_MODIFIED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    'MIR': ('job_name', 'catalyst_version', 'slot_number'),
+}
 
 def process_teradyne(record_type: str, record_data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -0,0 +1,69 @@
+# src/core/output_sinks/atdf_sink.py
+"""Output sink writing records to an ATDF text file."""
+import logging
+import os
+from typing import Any, Dict, IO, List, Optional
+
+from .base import RecordSink
+from ..atdf_generator.writers import get_atdf_writer
+
+# Import from top-level utils
+from ...utils.files import get_file_handle
+
+logger = logging.getLogger(__name__)
+
+# Number of ATDF lines collected before they are written to the file in one call
+ATDF_LINES_PER_WRITE = 4096
+
+
+class AtdfSink(RecordSink):
+    """
+    Writes each record as one ATDF line, formatted by the writer compiled for its record type.
+    Takes either an output path (opened on open(), gzip if it ends in .gz) or an open text file.
+    Lines are buffered and written in batches; close() (or flush()) writes the rest.
+    """
+
+    def __init__(self, atdf_path: Optional[str] = None, atdf_file: Optional[IO[str]] = None):
+        if (atdf_path is None) == (atdf_file is None):
+            raise ValueError("AtdfSink needs either atdf_path or atdf_file")
+        self.atdf_path = atdf_path
+        self.atdf_file = atdf_file
+        self._lines: List[str] = []
+
+    def open(self) -> None:
+        if self.atdf_path is not None:
+            self.atdf_file = get_file_handle(self.atdf_path, 'w')
+
+    def write(self, record_type: str, entry: Dict[str, Any]) -> None:
+        self._lines.append(get_atdf_writer(record_type)(entry))
+        if len(self._lines) >= ATDF_LINES_PER_WRITE:
+            self.flush()
+
+    def write_text(self, atdf_text: str) -> None:
+        """Write already formatted ATDF lines (e.g. produced by a worker process)."""
+        self.flush()
+        self.atdf_file.write(atdf_text)
+
+    def flush(self) -> None:
+        """Write the buffered lines to the file."""
+        if self._lines:
+            self.atdf_file.write(''.join(self._lines))
+            self._lines.clear()
+
+    def close(self) -> None:
+        if self.atdf_file is None:
+            return
+        self.flush()
+        # Only close files this sink opened
+        if self.atdf_path is not None:
+            self.atdf_file.close()
+            self.atdf_file = None
+
+    def abort(self) -> None:
+        self._lines.clear()
+        # Only delete files this sink opened
+        if self.atdf_path is not None and self.atdf_file is not None:
+            self.atdf_file.close()
+            self.atdf_file = None
+            os.remove(self.atdf_path)
+            logger.info(f"Removed incomplete ATDF file {self.atdf_path}")
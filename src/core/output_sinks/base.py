@@ -0,0 +1,66 @@
+# src/core/output_sinks/base.py
+"""
+Base class for output sinks.
+
+run_conversion passes every converted (and enriched) ATDF record to each sink in
+file order and then drops it, so memory use does not grow with the file size
+unless a sink keeps records itself (see MemorySink). If the conversion fails,
+the sinks are aborted instead of closed.
+"""
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..records import make_atdf_record
+
+logger = logging.getLogger(__name__)
+
+
+class RecordSink:
+    """
+    Receives converted ATDF records one by one.
+    Subclasses override write() and, if they hold resources, open() and close().
+    """
+
+    def open(self) -> None:
+        """Prepare the sink before the first record (e.g. open the output file)."""
+
+    def write(self, record_type: str, entry: Dict[str, Any]) -> None:
+        """Consume one ATDF record. The entry must not be modified."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Finish the output after the last record."""
+
+    def abort(self) -> None:
+        """
+        Discard the output after a failed conversion, instead of close(), so that no truncated
+        output is left behind. Sinks writing files delete them; the default calls close().
+        """
+        self.close()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class MemorySink(RecordSink):
+    """
+    Keeps records in memory, grouped by record type.
+    Only the record types in keep_record_types are kept (all types if None).
+    With compact_records, records are kept as slot records (see core.records) instead of
+    dicts; their as_dict() returns the original entry.
+    """
+
+    def __init__(self, keep_record_types: Optional[Iterable[str]] = None, compact_records: bool = False):
+        self.keep_record_types = None if keep_record_types is None else set(keep_record_types)
+        self.compact_records = compact_records
+        self.entries: Dict[str, List[Any]] = defaultdict(list)
+
+    def write(self, record_type: str, entry: Dict[str, Any]) -> None:
+        if self.keep_record_types is None or record_type in self.keep_record_types:
+            self.entries[record_type].append(make_atdf_record(record_type, entry) if self.compact_records else entry)
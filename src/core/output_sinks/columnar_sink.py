@@ -0,0 +1,230 @@
+# src/core/output_sinks/columnar_sink.py
+"""
+Output sink keeping records column by column instead of as one dict per record.
+
+Every field of every record type gets its own growable typed buffer, which
+holds no Python object per value:
+    ints    -> array('q'), with a null mask once a None is seen (pandas 'Int64')
+    floats  -> array('d'), None stored as NaN
+    strings -> array('i') of codes into a per-column string dictionary (pandas Categorical)
+Values of any other type (lists, bools, values of mixed types) fall back to a
+plain list. An int column that receives a float is promoted to floats; any other
+type change demotes the column to a list. Rows are collected in chunks of
+COLUMN_CHUNK_ROWS and each column of a chunk is converted in one go.
+
+to_dataframes() wraps the buffers in numpy arrays without copying them and
+returns one pandas DataFrame per record type, with the columns and values of
+pd.DataFrame(list_of_entries) but not its dtypes: int columns are int64, or the
+nullable 'Int64' if they have a None (pandas would give float64 with NaN);
+string columns are 'category' (pandas: object); float columns are float64 with
+NaN for None; other columns and columns of only None are object.
+"""
+import logging
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .base import RecordSink
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+NONE_TYPE = type(None)
+# Rows collected as Python values before they are converted into the typed buffers in bulk
+COLUMN_CHUNK_ROWS = 16384
+
+
+class ColumnBuffer:
+    """Values of one field, in a typed buffer chosen from the values that are not None."""
+    __slots__ = ('kind', 'length', 'values', 'nulls', 'categories')
+
+    def __init__(self, length: int = 0):
+        self.kind: Optional[str] = None # None while all values are None
+        self.length = length # Number of values, including the Nones
+        self.values: Any = None
+        self.nulls: Optional[bytearray] = None # Null mask of int columns, created at the first None
+        self.categories: Optional[Dict[str, int]] = None # String -> code of str columns
+
+    def extend(self, values: List[Any]) -> None:
+        """Append a chunk of values, changing the buffer type first if the chunk needs it."""
+        value_types = set(map(type, values))
+        has_nulls = NONE_TYPE in value_types
+        value_types.discard(NONE_TYPE)
+        kind = self.kind
+        if not value_types:
+            new_kind = kind
+        elif value_types == {int} and kind in (None, 'int', 'float'):
+            new_kind = kind or 'int'
+        elif value_types <= {int, float} and kind in (None, 'int', 'float'):
+            new_kind = 'float'
+        elif value_types == {str} and kind in (None, 'str'):
+            new_kind = 'str'
+        else:
+            new_kind = 'object'
+        if new_kind != kind:
+            self._convert(new_kind)
+
+        if new_kind == 'int':
+            try:
+                self._extend_ints(values, has_nulls)
+            except OverflowError:
+                # Beyond int64; the chunk was not added
+                self._convert('object')
+                self.values.extend(values)
+        elif new_kind == 'float':
+            self.values.extend([NAN if value is None else value for value in values] if has_nulls else values)
+        elif new_kind == 'str':
+            categories = self.categories
+            self.values.extend([-1 if value is None else categories.setdefault(value, len(categories))
+                                for value in values])
+        elif new_kind == 'object':
+            self.values.extend(values)
+        self.length += len(values)
+
+    def _extend_ints(self, values: List[Any], has_nulls: bool) -> None:
+        ints = array('q', [0 if value is None else value for value in values] if has_nulls else values)
+        if has_nulls and self.nulls is None:
+            self.nulls = bytearray(len(self.values))
+        if self.nulls is not None:
+            self.nulls.extend([value is None for value in values] if has_nulls else bytes(len(values)))
+        self.values.extend(ints)
+
+    def _convert(self, kind: str) -> None:
+        """Move the values collected so far into a buffer of another kind."""
+        if self.kind is None:
+            # All values so far were None
+            length = self.length
+            if kind == 'int':
+                self.values = array('q', bytes(8 * length))
+                self.nulls = bytearray(b'\x01') * length if length else None
+            elif kind == 'float':
+                self.values = array('d', [NAN]) * length
+            elif kind == 'str':
+                self.values, self.categories = array('i', [-1]) * length, {}
+            else:
+                self.values = [None] * length
+        elif kind == 'float':
+            # Only ints are promoted to floats
+            nulls = self.nulls or bytes(len(self.values))
+            self.values = array('d', [NAN if null else value for value, null in zip(self.values, nulls)])
+            self.nulls = None
+        else:
+            self.values = self.to_list()
+            self.nulls = self.categories = None
+        self.kind = kind
+
+    def to_list(self) -> List[Any]:
+        """Return the values as Python objects, None for missing values."""
+        kind = self.kind
+        if kind is None:
+            return [None] * self.length
+        if kind == 'int':
+            if self.nulls is None:
+                return self.values.tolist()
+            return [None if null else value for value, null in zip(self.values, self.nulls)]
+        if kind == 'float':
+            return [None if value != value else value for value in self.values]
+        if kind == 'str':
+            strings = list(self.categories)
+            return [strings[code] if code >= 0 else None for code in self.values]
+        return list(self.values)
+
+    def to_array(self):
+        """Return the values as a numpy or pandas extension array (sharing the buffer where possible)."""
+        import pandas as pd
+
+        kind = self.kind
+        if kind == 'int':
+            data = np.frombuffer(self.values, dtype=np.int64)
+            if self.nulls is None:
+                return data
+            return pd.arrays.IntegerArray(data, np.frombuffer(self.nulls, dtype=np.bool_))
+        if kind == 'float':
+            return np.frombuffer(self.values, dtype=np.float64)
+        if kind == 'str':
+            codes = np.frombuffer(self.values, dtype=np.int32)
+            return pd.Categorical.from_codes(codes, categories=list(self.categories))
+        data = np.empty(self.length, dtype=object)
+        if kind == 'object':
+            data[:] = self.values
+        return data
+
+
+class ColumnarTable:
+    """The columns of one record type, in order of first appearance of their field."""
+    __slots__ = ('record_type', 'row_count', 'columns', '_pending', '_pending_rows')
+
+    def __init__(self, record_type: str):
+        self.record_type = record_type
+        self.row_count = 0 # Rows in the typed buffers
+        self.columns: Dict[str, ColumnBuffer] = {}
+        self._pending: Dict[str, List[Any]] = {} # Field -> values of the rows not converted yet
+        self._pending_rows = 0
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        pending = self._pending
+        complete = len(entry) == len(pending)
+        for name, value in entry.items():
+            values = pending.get(name)
+            if values is None:
+                values = pending[name] = [None] * self._pending_rows
+                complete = False
+            values.append(value)
+        self._pending_rows += 1
+        if not complete:
+            # Fields this record does not have
+            for values in pending.values():
+                if len(values) < self._pending_rows:
+                    values.append(None)
+        if self._pending_rows >= COLUMN_CHUNK_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        """Convert the pending rows into the typed buffers."""
+        if not self._pending_rows:
+            return
+        for name, values in self._pending.items():
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = ColumnBuffer(self.row_count)
+            column.extend(values)
+            self._pending[name] = []
+        self.row_count += self._pending_rows
+        self._pending_rows = 0
+
+    def to_dataframe(self):
+        import pandas as pd
+        self.flush()
+        return pd.DataFrame({name: column.to_array() for name, column in self.columns.items()},
+                            index=pd.RangeIndex(self.row_count), copy=False)
+
+
+class ColumnarSink(RecordSink):
+    """
+    Keeps records in typed column buffers per record type (see module docstring).
+    Only the record types in keep_record_types are kept (all types if None).
+    """
+
+    def __init__(self, keep_record_types: Optional[Iterable[str]] = None):
+        self.keep_record_types = None if keep_record_types is None else set(keep_record_types)
+        self.tables: Dict[str, ColumnarTable] = {}
+
+    def write(self, record_type: str, entry: Dict[str, Any]) -> None:
+        if self.keep_record_types is not None and record_type not in self.keep_record_types:
+            return
+        table = self.tables.get(record_type)
+        if table is None:
+            table = self.tables[record_type] = ColumnarTable(record_type)
+        table.append(entry)
+
+    def close(self) -> None:
+        for table in self.tables.values():
+            table.flush()
+
+    def to_dataframes(self) -> Dict[str, Any]:
+        """
+        Return a pandas DataFrame per record type. The frames share the numeric buffers of
+        the sink, so call this after the conversion, when no more records are written.
+        """
+        return {record_type: table.to_dataframe() for record_type, table in self.tables.items()}
@@ -0,0 +1,79 @@
+# src/core/output_sinks/csv_sink.py
+"""
+Output sink writing one CSV file per record type.
+
+For an output prefix 'lot1', PTR records go to 'lot1.PTR.csv', PRR records to
+'lot1.PRR.csv', and so on; a file is created when the first record of its type
+arrives. The header is the field list of that first record (the ATDF fields of
+the record type, then w_id/p_id). Values are written as in the JSON output:
+None as an empty cell, list values (e.g. MPR results) joined with ','.
+"""
+import csv
+import logging
+import os
+from typing import Any, Dict, FrozenSet, IO, List, Tuple
+
+import numpy as np
+
+from .base import RecordSink
+
+logger = logging.getLogger(__name__)
+
+LIST_TYPES = (list, tuple, np.ndarray)
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    return ','.join(map(str, value))
+
+
+class CsvSink(RecordSink):
+    """Writes the records of each record type to '<csv_prefix>.<record type>.csv'."""
+
+    def __init__(self, csv_prefix: str):
+        self.csv_prefix = csv_prefix
+        # Record type -> (file, csv writer, field names, set of the field names)
+        self._writers: Dict[str, Tuple[IO[str], Any, List[str], FrozenSet[str]]] = {}
+        self._warned_record_types = set()
+
+    def get_csv_path(self, record_type: str) -> str:
+        return f"{self.csv_prefix}.{record_type}.csv"
+
+    def write(self, record_type: str, entry: Dict[str, Any]) -> None:
+        writer_state = self._writers.get(record_type)
+        if writer_state is None:
+            csv_file = open(self.get_csv_path(record_type), 'w', newline='')
+            writer = csv.writer(csv_file)
+            fieldnames = list(entry)
+            writer.writerow(fieldnames)
+            writer_state = self._writers[record_type] = (csv_file, writer, fieldnames, frozenset(fieldnames))
+        _, writer, fieldnames, fieldname_set = writer_state
+
+        # Cells are looked up by name, so only the set of fields matters, not their order
+        if entry.keys() != fieldname_set and record_type not in self._warned_record_types:
+            # E.g. fields added by a modifier to some records only
+            self._warned_record_types.add(record_type)
+            logger.warning(f"{record_type} records have fields other than the CSV columns of "
+                           f"{self.get_csv_path(record_type)}; only the columns of the first record are written")
+        row = [entry.get(name) for name in fieldnames]
+        for position, value in enumerate(row):
+            if isinstance(value, LIST_TYPES):
+                row[position] = _csv_value(value)
+        writer.writerow(row)
+
+    def close(self) -> None:
+        for csv_file, _, _, _ in self._writers.values():
+            csv_file.close()
+        if self._writers:
+            logger.info(f"Successfully wrote CSV files {self.csv_prefix}.*.csv "
+                        f"for {', '.join(self._writers)}")
+        self._writers.clear()
+
+    def abort(self) -> None:
+        for record_type, (csv_file, _, _, _) in self._writers.items():
+            csv_file.close()
+            os.remove(self.get_csv_path(record_type))
+        if self._writers:
+            logger.info(f"Removed incomplete CSV files {self.csv_prefix}.*.csv")
+        self._writers.clear()
@@ -0,0 +1,183 @@
+# src/core/output_sinks/json_sink.py
+"""
+Output sinks writing records as JSON while they are produced.
+
+JsonSink writes the grouped layout {"FAR": [...], "ATR": [...], ...}, identical
+to json.dump(entries, f, indent=4). Records are appended to one temporary spill
+file per record type as they arrive, and the spill files are concatenated into
+the output when the sink is closed.
+
+NdjsonSink writes JSON Lines: one compact JSON object per record, with its
+record type in the "record_type" key, directly to the output file.
+
+In a parallel conversion, the worker processes encode the records of their chunk
+(JsonPartsSink, or an NdjsonSink on a text buffer), and the output sinks append
+the text (JsonSink.write_parts, NdjsonSink.write_text).
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, IO, List, Optional
+
+import numpy as np
+
+from .base import RecordSink
+
+logger = logging.getLogger(__name__)
+
+# Indentation of an entry inside the grouped layout (object -> record type list -> entry)
+ENTRY_INDENT = ' ' * 8
+
+
+def _to_json_value(value: Any) -> Any:
+    """JSON default hook: numpy arrays (e.g. decoded x-arrays) as lists, numpy scalars as Python numbers."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Encoders are built once instead of on every json.dumps call
+_GROUPED_ENCODER = json.JSONEncoder(indent=4, default=_to_json_value)
+_COMPACT_ENCODER = json.JSONEncoder(default=_to_json_value)
+
+
+def _encode_grouped_entry(record_type: str, entry: Dict[str, Any], json_path: str) -> Optional[str]:
+    """Encode an entry as it appears in the list of its record type, None if it is not serializable."""
+    try:
+        entry_text = _GROUPED_ENCODER.encode(entry)
+    except TypeError as e:
+        logger.error(f"Error serializing {record_type} record to JSON for {json_path}: {e}. "
+                     f"Ensure all data is JSON serializable.")
+        return None
+    return ENTRY_INDENT + entry_text.replace('\n', '\n' + ENTRY_INDENT)
+
+
+class JsonSink(RecordSink):
+    """
+    Writes all records to one JSON object keyed by record type ({"FAR": [...], ...}),
+    record types in order of first appearance, indented for readability.
+    """
+
+    def __init__(self, json_path: str):
+        self.json_path = json_path
+        self._spill_files: Dict[str, IO[str]] = {} # Record type -> spill file, in order of first appearance
+        self._spill_dir = os.path.dirname(os.path.abspath(json_path))
+
+    def write(self, record_type: str, entry: Dict[str, Any]) -> None:
+        entry_text = _encode_grouped_entry(record_type, entry, self.json_path)
+        if entry_text is not None:
+            self._append(record_type, entry_text)
+
+    def write_parts(self, parts: Dict[str, str]) -> None:
+        """Append already encoded entries by record type (see JsonPartsSink.get_parts)."""
+        for record_type, entries_text in parts.items():
+            self._append(record_type, entries_text)
+
+    def _append(self, record_type: str, entries_text: str) -> None:
+        spill_file = self._spill_files.get(record_type)
+        if spill_file is None:
+            spill_file = self._spill_files[record_type] = tempfile.TemporaryFile('w+', dir=self._spill_dir)
+        else:
+            spill_file.write(',\n')
+        spill_file.write(entries_text)
+
+    def close(self) -> None:
+        logger.info(f"Writing processed ATDF data to JSON file: {self.json_path}")
+        try:
+            with open(self.json_path, 'w') as f_json:
+                if not self._spill_files:
+                    f_json.write('{}')
+                else:
+                    f_json.write('{\n')
+                    for position, (record_type, spill_file) in enumerate(self._spill_files.items()):
+                        if position:
+                            f_json.write(',\n')
+                        f_json.write(f'    {json.dumps(record_type)}: [\n')
+                        spill_file.seek(0)
+                        shutil.copyfileobj(spill_file, f_json)
+                        f_json.write('\n    ]')
+                    f_json.write('\n}')
+            logger.info(f"Successfully wrote JSON to {self.json_path}")
+        except IOError as e:
+            logger.error(f"Error writing JSON to {self.json_path}: {e}")
+        finally:
+            self._close_spill_files()
+
+    def abort(self) -> None:
+        # The output file is only written by close(), so an existing one is left as it was
+        self._close_spill_files()
+
+    def _close_spill_files(self) -> None:
+        for spill_file in self._spill_files.values():
+            spill_file.close()
+        self._spill_files.clear()
+
+
+class JsonPartsSink(RecordSink):
+    """
+    Encodes records as JsonSink does and keeps the text in memory by record type, for
+    JsonSink.write_parts (used by the worker processes of a parallel conversion).
+    json_path only names the output in error messages.
+    """
+
+    def __init__(self, json_path: str):
+        self.json_path = json_path
+        self._parts: Dict[str, List[str]] = {} # Record type -> encoded entries, in order of first appearance
+
+    def write(self, record_type: str, entry: Dict[str, Any]) -> None:
+        entry_text = _encode_grouped_entry(record_type, entry, self.json_path)
+        if entry_text is not None:
+            self._parts.setdefault(record_type, []).append(entry_text)
+
+    def get_parts(self) -> Dict[str, str]:
+        return {record_type: ',\n'.join(entry_texts) for record_type, entry_texts in self._parts.items()}
+
+
+class NdjsonSink(RecordSink):
+    """
+    Writes one JSON object per line: {"record_type": "PTR", <ATDF fields>...}.
+    Takes either an output path (opened on open()) or an open text file.
+    """
+
+    def __init__(self, ndjson_path: Optional[str] = None, ndjson_file: Optional[IO[str]] = None):
+        if (ndjson_path is None) == (ndjson_file is None):
+            raise ValueError("NdjsonSink needs either ndjson_path or ndjson_file")
+        self.ndjson_path = ndjson_path
+        self._ndjson_file: Optional[IO[str]] = ndjson_file
+
+    def open(self) -> None:
+        if self.ndjson_path is not None:
+            self._ndjson_file = open(self.ndjson_path, 'w')
+
+    def write(self, record_type: str, entry: Dict[str, Any]) -> None:
+        try:
+            line = _COMPACT_ENCODER.encode({'record_type': record_type, **entry})
+        except TypeError as e:
+            logger.error(f"Error serializing {record_type} record to JSON for {self.ndjson_path}: {e}. "
+                         f"Ensure all data is JSON serializable.")
+            return
+        self._ndjson_file.write(line)
+        self._ndjson_file.write('\n')
+
+    def write_text(self, ndjson_text: str) -> None:
+        """Write already encoded lines (e.g. produced by a worker process)."""
+        self._ndjson_file.write(ndjson_text)
+
+    def close(self) -> None:
+        # Only close files this sink opened
+        if self._ndjson_file is not None and self.ndjson_path is not None:
+            self._ndjson_file.close()
+            self._ndjson_file = None
+            logger.info(f"Successfully wrote JSON Lines to {self.ndjson_path}")
+
+    def abort(self) -> None:
+        # Only delete files this sink opened
+        if self._ndjson_file is not None and self.ndjson_path is not None:
+            self._ndjson_file.close()
+            self._ndjson_file = None
+            os.remove(self.ndjson_path)
+            logger.info(f"Removed incomplete JSON Lines file {self.ndjson_path}")
@@ -0,0 +1,53 @@
+# src/core/output_sinks/stats_sink.py
+"""Output sink counting records without keeping them."""
+import json
+import logging
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from .base import RecordSink
+
+logger = logging.getLogger(__name__)
+
+
+class StatsSink(RecordSink):
+    """
+    Counts records per record type and the number of parts and wafers.
+    With stats_path, the summary is also written there as JSON on close().
+    """
+
+    def __init__(self, stats_path: Optional[str] = None):
+        self.stats_path = stats_path
+        self.record_counts: Counter = Counter()
+
+    @property
+    def total_records(self) -> int:
+        return sum(self.record_counts.values())
+
+    def write(self, record_type: str, entry: Dict[str, Any]) -> None:
+        self.record_counts[record_type] += 1
+
+    def add_counts(self, record_counts: Dict[str, int]) -> None:
+        """Add records counted elsewhere (e.g. by a worker process) by record type."""
+        self.record_counts.update(record_counts)
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the counts as a plain dictionary."""
+        return {
+            'records': self.total_records,
+            'wafers': self.record_counts['WIR'],
+            'parts': self.record_counts['PIR'],
+            'record_counts': dict(self.record_counts),
+        }
+
+    def abort(self) -> None:
+        """Counts of a failed conversion are not written."""
+
+    def close(self) -> None:
+        logger.info(f"Converted {self.total_records} records "
+                    f"({self.record_counts['WIR']} wafers, {self.record_counts['PIR']} parts): "
+                    f"{dict(self.record_counts)}")
+        if self.stats_path:
+            with open(self.stats_path, 'w') as f_stats:
+                json.dump(self.summary(), f_stats, indent=4)
+            logger.info(f"Successfully wrote record statistics to {self.stats_path}")
@@ -0,0 +1,135 @@
+# src/core/output_sinks/threaded_sink.py
+"""
+Runs an output sink in its own writer thread.
+
+ThreadedSink wraps a sink that writes files (ATDF, JSON, CSV ...). Records are
+handed over in batches of SINK_BATCH_RECORDS through a queue bounded at
+SINK_QUEUE_BATCHES batches; the writer thread passes them to the wrapped sink.
+File writes release the GIL, so a slow disk only fills the queue instead of
+stalling decoding; a full queue blocks the producer until the writer catches
+up, so memory use stays bounded. Every sink gets its own thread and queue,
+so one slow output does not hold back the others.
+
+Records are only read by the sinks (see RecordSink.write), so the same entry
+can be handed to several writer threads.
+
+Each ThreadedSink keeps a StageTimer of its writer thread (timer) and the time
+the producer spent blocked on its full queue (blocked_seconds).
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .base import RecordSink
+from ...utils.timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Records handed to the writer thread at once, and batches waiting in its queue
+SINK_BATCH_RECORDS = 1024
+SINK_QUEUE_BATCHES = 16
+
+_STOP = object() # Queue item ending the writer thread
+
+
+class ThreadedSink(RecordSink):
+    """Passes records to the wrapped sink from a writer thread (see module docstring)."""
+
+    def __init__(self, sink: RecordSink, batch_records: int = SINK_BATCH_RECORDS,
+                 max_batches: int = SINK_QUEUE_BATCHES):
+        self.sink = sink
+        self._batch_records = batch_records
+        self._max_batches = max_batches
+        self._batch: List[Tuple[str, Dict[str, Any]]] = []
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self.timer = StageTimer(f"write:{type(sink).__name__}")
+        self.blocked_seconds = 0.0 # Time write() waited for space in the queue
+
+    def open(self) -> None:
+        # The wrapped sink is opened here, so errors such as a missing output directory are raised directly
+        self.sink.open()
+        self._queue = queue.Queue(maxsize=self._max_batches)
+        self._thread = threading.Thread(target=self._run, name=f"sink-writer-{type(self.sink).__name__}",
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """Thread body: pass queued batches (lists of records, text, or JSON parts) to the wrapped sink."""
+        sink, timer = self.sink, self.timer
+        while True:
+            start = time.perf_counter()
+            item = self._queue.get()
+            got_item = time.perf_counter()
+            timer.waiting += got_item - start
+            if item is _STOP:
+                return
+            if isinstance(item, str):
+                try:
+                    sink.write_text(item)
+                except Exception as e:
+                    logger.error(f"Error writing text to {type(sink).__name__}: {e}", exc_info=True)
+            elif isinstance(item, dict):
+                try:
+                    sink.write_parts(item)
+                except Exception as e:
+                    logger.error(f"Error writing text to {type(sink).__name__}: {e}", exc_info=True)
+            else:
+                for record_type, entry in item:
+                    try:
+                        sink.write(record_type, entry)
+                    except Exception as e:
+                        logger.error(f"Generic error processing record: {e}", exc_info=True)
+                timer.records += len(item)
+            timer.busy += time.perf_counter() - got_item
+
+    def write(self, record_type: str, entry: Dict[str, Any]) -> None:
+        batch = self._batch
+        batch.append((record_type, entry))
+        if len(batch) >= self._batch_records:
+            self._put(batch)
+            self._batch = []
+
+    def write_text(self, text: str) -> None:
+        """Forward already formatted text (see AtdfSink.write_text), after the records written before it."""
+        self._put_batch()
+        self._put(text)
+
+    def write_parts(self, parts: Dict[str, str]) -> None:
+        """Forward already encoded JSON entries (see JsonSink.write_parts), after the records written before it."""
+        self._put_batch()
+        self._put(parts)
+
+    def _put(self, item: Any) -> None:
+        start = time.perf_counter()
+        self._queue.put(item)
+        self.blocked_seconds += time.perf_counter() - start
+
+    def _put_batch(self) -> None:
+        if self._batch:
+            self._put(self._batch)
+            self._batch = []
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._put_batch()
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        self.sink.close()
+
+    def abort(self) -> None:
+        """Stop the writer thread without writing the queued records, then abort the wrapped sink."""
+        if self._thread is not None:
+            self._batch = []
+            try:
+                while True:
+                    self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        self.sink.abort()
@@ -0,0 +1,215 @@
+# src/core/records.py
+"""
+Compact record classes generated from STDF_TEMPLATES and ATDF_TEMPLATES.
+
+Every record type gets a class with one __slots__ entry per template field
+(StdfPTR, AtdfPTR, ...). A slot record needs a fraction of the memory of a dict
+with string keys, which matters when millions of records are kept for analysis.
+String values of ATDF records are interned, so repeated test names, units and
+flag strings are stored once. as_dict() returns the same dict the converter
+produces, for the JSON and pandas consumers.
+
+ATDF records also carry the w_id and p_id keys of the id enricher, in slots of
+their own. Other keys that are not in the template (e.g. fields added by record
+modifiers) are kept in an 'extras' dict, which stays None for most records.
+"""
+import logging
+from operator import attrgetter
+from sys import intern
+from typing import Any, Dict, Sequence, Type
+
+import numpy as np
+
+from .atdf_generator.templates import ATDF_TEMPLATES
+from .stdf_parser.schema import STDF_SCHEMAS
+
+logger = logging.getLogger(__name__)
+
+
+class _Missing:
+    """Marks a template field that is not present in the record."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'MISSING'
+
+
+MISSING = _Missing()
+
+
+class Record:
+    """Base class of the generated record classes."""
+    __slots__ = ()
+    record_type: str = ''
+    fields: tuple = ()
+
+    def as_dict(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        entry, other_entry = self.as_dict(), other.as_dict()
+        if entry.keys() != other_entry.keys():
+            return False
+        # Decoded x-arrays are numpy arrays, which do not compare to a single bool
+        return all(np.array_equal(value, other_entry[name]) if isinstance(value, np.ndarray) else value == other_entry[name]
+                   for name, value in entry.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+    def __getstate__(self):
+        return self.as_dict()
+
+
+class StdfRecord(Record):
+    """Decoded STDF record. Fields omitted at the end of a truncated record are MISSING."""
+    __slots__ = ()
+
+    @classmethod
+    def from_values(cls, values: Sequence[Any]) -> 'StdfRecord':
+        """Build a record from a decoded value tuple (see stdf_parser.schema)."""
+        record = cls.__new__(cls)
+        values = tuple(values)
+        if len(values) < len(cls.fields):
+            values += (MISSING,) * (len(cls.fields) - len(values))
+        for name, value in zip(cls.fields, values):
+            setattr(record, name, value)
+        return record
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: value for name, value in zip(self.fields, self._get_all(self)) if value is not MISSING}
+
+    def __setstate__(self, state):
+        for name in self.fields:
+            setattr(self, name, state.get(name, MISSING))
+
+
+# Keys added by add_hierarchical_ids (id_enricher.py), in the order it adds them per record type
+ID_KEY_ORDER = {
+    'WIR': ('w_id',),
+    'WRR': ('w_id',),
+    'PIR': ('p_id', 'w_id'),
+    'PRR': ('p_id', 'w_id'),
+    'PTR': ('p_id',),
+    'MPR': ('p_id',),
+    'FTR': ('p_id',),
+}
+
+
+class AtdfRecord(Record):
+    """
+    Converted ATDF record. The w_id/p_id keys of the id enricher have their own slots;
+    any other keys outside the template (e.g. from record modifiers) are kept in 'extras',
+    which then also holds w_id/p_id to preserve the key order.
+    """
+    __slots__ = ('w_id', 'p_id', 'extras')
+    id_keys: tuple = ()
+
+    @classmethod
+    def from_dict(cls, entry: Dict[str, Any]) -> 'AtdfRecord':
+        """Build a record from an ATDF entry dict."""
+        record = cls.__new__(cls)
+        get = entry.get
+        present = 0
+        for name in cls.fields:
+            value = get(name, MISSING)
+            if value is not MISSING:
+                present += 1
+                if type(value) is str:
+                    value = intern(value) # Test names, units, flags etc. repeat in every record
+            setattr(record, name, value)
+        record.w_id = record.p_id = MISSING
+        record.extras = None
+        if len(entry) > present:
+            field_set = cls._field_set
+            extras = {key: value for key, value in entry.items() if key not in field_set}
+            if tuple(extras) == tuple(key for key in cls.id_keys if key in extras):
+                for key, value in extras.items():
+                    setattr(record, key, value)
+            else:
+                record.extras = extras
+        return record
+
+    def as_dict(self) -> Dict[str, Any]:
+        entry = {name: value for name, value in zip(self.fields, self._get_all(self)) if value is not MISSING}
+        if self.extras:
+            entry.update(self.extras)
+        else:
+            for key in self.id_keys:
+                value = getattr(self, key)
+                if value is not MISSING:
+                    entry[key] = value
+        return entry
+
+    def __setstate__(self, state):
+        for name in self.fields:
+            setattr(self, name, state.get(name, MISSING))
+        self.w_id = self.p_id = MISSING
+        self.extras = None
+        field_set = self._field_set
+        extras = {key: value for key, value in state.items() if key not in field_set}
+        if tuple(extras) == tuple(key for key in self.id_keys if key in extras):
+            for key, value in extras.items():
+                setattr(self, key, value)
+        elif extras:
+            self.extras = extras
+
+
+def make_record_class(base: Type[Record], prefix: str, record_type: str, fields: Sequence[str]) -> Type[Record]:
+    """Generate a slot record class named prefix + record_type with one slot per field."""
+    fields = tuple(fields)
+    reserved = set(dir(base))
+    clashes = [name for name in fields if name in reserved or not name.isidentifier()]
+    if clashes:
+        raise ValueError(f"Field names {clashes} of record {record_type} cannot be used as attributes")
+    namespace = {
+        '__slots__': fields,
+        '__module__': __name__,
+        'record_type': record_type,
+        'fields': fields,
+        '_field_set': frozenset(fields),
+        'id_keys': ID_KEY_ORDER.get(record_type, ()),
+        # attrgetter with several names returns a tuple; with one name, wrap it
+        '_get_all': staticmethod(attrgetter(*fields)) if len(fields) > 1
+                    else staticmethod(lambda record: (getattr(record, fields[0]),)) if fields
+                    else staticmethod(lambda record: ()),
+    }
+    return type(f"{prefix}{record_type}", (base,), namespace)
+
+
+def _register(record_classes: Dict[str, Type[Record]]) -> None:
+    # Module-level names make the generated classes picklable
+    for record_class in record_classes.values():
+        globals()[record_class.__name__] = record_class
+
+
+# Generated once at import time.
+STDF_RECORD_CLASSES = {record_type: make_record_class(StdfRecord, 'Stdf', record_type, schema.field_names)
+                       for record_type, schema in STDF_SCHEMAS.items()}
+ATDF_RECORD_CLASSES = {record_type: make_record_class(AtdfRecord, 'Atdf', record_type, fields)
+                       for record_type, fields in ATDF_TEMPLATES.items()}
+_register(STDF_RECORD_CLASSES)
+_register(ATDF_RECORD_CLASSES)
+
+
+def get_stdf_record_class(record_type: str) -> Type[StdfRecord]:
+    """Return the generated STDF record class of record_type."""
+    try:
+        return STDF_RECORD_CLASSES[record_type]
+    except KeyError:
+        raise ValueError(f"No record class found for STDF record type {record_type}")
+
+
+def get_atdf_record_class(record_type: str) -> Type[AtdfRecord]:
+    """Return the generated ATDF record class of record_type."""
+    try:
+        return ATDF_RECORD_CLASSES[record_type]
+    except KeyError:
+        raise ValueError(f"No record class found for ATDF record type {record_type}")
+
+
+def make_atdf_record(record_type: str, entry: Dict[str, Any]) -> AtdfRecord:
+    """Convert an ATDF entry dict into a slot record of its record type."""
+    return get_atdf_record_class(record_type).from_dict(entry)
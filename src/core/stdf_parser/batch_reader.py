@@ -0,0 +1,105 @@
+# src/core/stdf_parser/batch_reader.py
+"""
+Reader stage of a pipelined conversion.
+
+A background thread iterates over the records of an open STDF file (see
+iter_stdf_records) and puts them in batches of READER_BATCH_RECORDS into a queue
+bounded at READER_QUEUE_BATCHES batches, while the converting thread decodes the
+previous batches. Reads from slow (e.g. network-mounted) storage and the header
+walk then overlap with decoding instead of adding to it; a full queue stops the
+reader until the decoder catches up, so memory use stays bounded.
+
+Once iteration has started, the file must only be used through this reader.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import IO, AbstractSet, Any, Iterator, List, Optional, Tuple
+
+from .handler import iter_stdf_records
+from ...utils.timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Records per batch, and batches read ahead of the decoder
+READER_BATCH_RECORDS = 1024
+READER_QUEUE_BATCHES = 8
+
+RawRecord = Tuple[int, int, Any] # (rec_typ, rec_sub, payload)
+
+
+def _read_batches(stdf_file: IO[bytes], endianness: str, record_keys: Optional[AbstractSet[Tuple[int, int]]],
+                  batches: queue.Queue, stop_event: threading.Event, batch_records: int,
+                  reader_timer: StageTimer) -> None:
+    """Thread body: put lists of records, then None at the end (or the exception that stopped it)."""
+    def put(item) -> bool:
+        start = time.perf_counter()
+        try:
+            while not stop_event.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        finally:
+            reader_timer.waiting += time.perf_counter() - start
+
+    try:
+        batch: List[RawRecord] = []
+        start = time.perf_counter()
+        for record in iter_stdf_records(stdf_file, endianness, record_keys):
+            batch.append(record)
+            if len(batch) >= batch_records:
+                reader_timer.busy += time.perf_counter() - start
+                reader_timer.records += len(batch)
+                if not put(batch):
+                    return
+                batch = []
+                start = time.perf_counter()
+        reader_timer.busy += time.perf_counter() - start
+        reader_timer.records += len(batch)
+        if batch and not put(batch):
+            return
+        put(None)
+    except Exception as e:
+        put(e)
+
+
+def iter_record_batches(stdf_file: IO[bytes], endianness: str,
+                        record_keys: Optional[AbstractSet[Tuple[int, int]]],
+                        reader_timer: StageTimer, decoder_timer: StageTimer,
+                        batch_records: int = READER_BATCH_RECORDS,
+                        max_batches: int = READER_QUEUE_BATCHES) -> Iterator[List[RawRecord]]:
+    """
+    Iterate over the records of an open STDF file in batches read by a background thread.
+    Records and their filtering are the same as for iter_stdf_records. The reader's time goes to
+    reader_timer; the time the caller waits for the next batch goes to decoder_timer.waiting.
+    Errors of the reader are re-raised here.
+    """
+    batches: queue.Queue = queue.Queue(maxsize=max_batches)
+    stop_event = threading.Event()
+    thread = threading.Thread(target=_read_batches, name="stdf-reader", daemon=True,
+                              args=(stdf_file, endianness, record_keys, batches, stop_event,
+                                    batch_records, reader_timer))
+    thread.start()
+    try:
+        while True:
+            start = time.perf_counter()
+            item = batches.get()
+            decoder_timer.waiting += time.perf_counter() - start
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Stop a reader still running (the caller stopped early or failed) and wait for it
+        stop_event.set()
+        try:
+            while True:
+                batches.get_nowait()
+        except queue.Empty:
+            pass
+        thread.join()
@@ -0,0 +1,212 @@
+# src/core/stdf_parser/decoders.py
+"""
+Compiles the record schemas (see .schema) into one specialized decode function per record type.
+
+Each schema is turned into a list of decode steps when the module is imported:
+runs of consecutive fixed-width fields are merged into a single precompiled
+struct.Struct.unpack_from call, and only the variable-length fields (C*n, B*n,
+D*n, V*n and the x-arrays) are unpacked one by one. The numeric arrays (xU*1,
+xU*2, xR*4, xN*1) are decoded into numpy arrays with np.frombuffer.
+"""
+
+import logging
+import struct
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .schema import HEADER_FIELD_COUNT, STDF_SCHEMAS, get_stdf_schema
+from .unpackers import ARRAY_UNPACKERS, unpack_dtype
+
+logger = logging.getLogger(__name__)
+
+# struct format characters for the fixed-width STDF data types.
+FIXED_WIDTH_FORMATS = {
+    "C*1": "c",
+    "U*1": "B",
+    "U*2": "H",
+    "U*4": "I",
+    "I*1": "b",
+    "I*2": "h",
+    "I*4": "i",
+    "R*4": "f",
+    "R*8": "d",
+    "B*1": "B",
+    "N*1": "B",
+}
+
+
+def _convert_C1(raw: bytes) -> Optional[str]:
+    return None if raw == b'\x00' else raw.decode()
+
+
+def _convert_N1(raw: int) -> str:
+    return hex(raw & 0x0F)[2:].upper() # extract only the lower nibble
+
+
+# Post-unpack conversions for fixed-width types whose struct value is not the final value.
+# B*1 flags are kept as ints.
+FIXED_WIDTH_CONVERTERS = {
+    "C*1": _convert_C1,
+    "N*1": _convert_N1,
+}
+
+# A decode step receives (data, offset, values, data_len) and returns the new offset.
+DecodeStep = Callable[[Any, int, List[Any], int], int]
+
+
+class _StopDecoding(Exception):
+    """Raised by a decode step when the rest of the record cannot be decoded."""
+
+    def __init__(self, decoded_count: int):
+        super().__init__(decoded_count)
+        self.decoded_count = decoded_count # Number of fields decoded before stopping
+
+
+def _make_fixed_run_step(record_type: str, endianness: str, first_index: int,
+                         names: List[str], dtypes: List[str]) -> DecodeStep:
+    """Build a step that unpacks a run of fixed-width fields with one Struct call."""
+    run_struct = struct.Struct(endianness + ''.join(FIXED_WIDTH_FORMATS[dtype] for dtype in dtypes))
+    unpack_from = run_struct.unpack_from
+    run_size = run_struct.size
+    stop_index = first_index + len(names)
+    converters = [(first_index + i, FIXED_WIDTH_CONVERTERS[dtype])
+                  for i, dtype in enumerate(dtypes) if dtype in FIXED_WIDTH_CONVERTERS]
+    # Per-field structs for records that end inside this run
+    field_structs = [struct.Struct(endianness + FIXED_WIDTH_FORMATS[dtype]) for dtype in dtypes]
+
+    def fixed_run_step(data, offset, values, data_len):
+        end = offset + run_size
+        if end <= data_len:
+            values[first_index:stop_index] = unpack_from(data, offset)
+            for index, converter in converters:
+                values[index] = converter(values[index])
+            return end
+        # The record ends inside this run (optional trailing fields omitted).
+        # Fall back to field-by-field decoding for the fields that are present.
+        for i, field_struct in enumerate(field_structs):
+            if offset >= data_len:
+                raise _StopDecoding(first_index + i)
+            if offset + field_struct.size > data_len:
+                logger.error(f"Struct unpack error for field {names[i]} (dtype {dtypes[i]}) in record {record_type}: "
+                             f"needs {field_struct.size} bytes. Offset: {offset}, Data length: {data_len}")
+                raise _StopDecoding(first_index + i)
+            value = field_struct.unpack_from(data, offset)[0]
+            converter = FIXED_WIDTH_CONVERTERS.get(dtypes[i])
+            values[first_index + i] = converter(value) if converter else value
+            offset += field_struct.size
+        return offset
+
+    return fixed_run_step
+
+
+def _make_variable_step(record_type: str, endianness: str, index: int, name: str,
+                        dtype: str, ref_index: Optional[int]) -> DecodeStep:
+    """Build a step that unpacks a single variable-length field."""
+
+    array_unpacker = ARRAY_UNPACKERS.get(dtype)
+
+    def variable_step(data, offset, values, data_len):
+        array_size = values[ref_index] if ref_index is not None else 0
+        try:
+            if array_unpacker is not None:
+                values[index], offset = array_unpacker(data, endianness, offset, array_size)
+            else:
+                values[index], offset = unpack_dtype(dtype, data, endianness, offset, array_size=array_size)
+        except struct.error as e:
+            logger.error(f"Struct unpack error for field {name} (dtype {dtype}) in record {record_type}: {e}. "
+                         f"Offset: {offset}, Data length: {data_len}")
+            raise _StopDecoding(index)
+        except IndexError as e:
+            logger.error(f"Index error (likely insufficient data) for field {name} (dtype {dtype}) in record {record_type}: {e}. "
+                         f"Offset: {offset}, Data length: {data_len}")
+            raise _StopDecoding(index)
+        except Exception as e:
+            logger.error(f"Unexpected error unpacking field {name} (dtype {dtype}) in record {record_type}: {e}. "
+                         f"Offset: {offset}, Data length: {data_len}")
+            raise _StopDecoding(index)
+        if offset > data_len:
+            logger.warning(f"Offset ({offset}) exceeded data length ({data_len}) after processing field {name} "
+                           f"in record {record_type}. Record may be corrupt or truncated.")
+            raise _StopDecoding(index + 1)
+        return offset
+
+    return variable_step
+
+
+def compile_decoder(record_type: str, endianness: str) -> Callable[[Any], Tuple[Any, ...]]:
+    """
+    Compile the schema of record_type into a decode function.
+
+    The returned function takes the record payload (everything after the 4-byte header)
+    and returns a tuple of the field values in schema order, with values matching a
+    'missing' condition already set to None. Fields omitted at the end of a truncated
+    record are not included, so the tuple is then shorter than the schema.
+    """
+    schema = get_stdf_schema(record_type)
+    names = schema.field_names
+    missing_checks = schema.missing_checks
+
+    steps: List[DecodeStep] = []
+    # fields_done_after_step[n] is the number of fields decoded once n steps have run.
+    fields_done_after_step: List[int] = [0]
+    run: List[Tuple[int, str, str]] = []
+
+    def flush_run():
+        if run:
+            steps.append(_make_fixed_run_step(record_type, endianness, run[0][0],
+                                              [name for _, name, _ in run],
+                                              [dtype for _, _, dtype in run]))
+            fields_done_after_step.append(run[-1][0] + 1)
+            run.clear()
+
+    for i, (name, dtype) in enumerate(zip(names, schema.dtypes)):
+        if dtype in FIXED_WIDTH_FORMATS:
+            run.append((i, name, dtype))
+            continue
+        flush_run()
+        steps.append(_make_variable_step(record_type, endianness, i, name, dtype, schema.refs[i]))
+        fields_done_after_step.append(i + 1)
+    flush_run()
+
+    field_count = len(names)
+
+    def decode(data) -> Tuple[Any, ...]:
+        values = [None] * field_count
+        data_len = len(data)
+        offset = 0
+        decoded_count = field_count
+        try:
+            for step_number, step in enumerate(steps):
+                if offset >= data_len:
+                    # All data consumed; the remaining optional fields are omitted.
+                    decoded_count = fields_done_after_step[step_number]
+                    break
+                offset = step(data, offset, values, data_len)
+        except _StopDecoding as stop:
+            decoded_count = stop.decoded_count
+
+        for index, is_missing in missing_checks:
+            if index < decoded_count and is_missing(values[index], values):
+                values[index] = None
+        if decoded_count == field_count:
+            return tuple(values)
+        return tuple(values[:decoded_count])
+
+    decode.__name__ = f"decode_{record_type}"
+    return decode
+
+
+def compile_decoders(endianness: str) -> Dict[str, Callable[[Any], Tuple[Any, ...]]]:
+    """Compile a decode function for every record type with a schema."""
+    return {record_type: compile_decoder(record_type, endianness) for record_type in STDF_SCHEMAS}
+
+
+# Compiled once at import time for both byte orders.
+STDF_DECODERS = {endianness: compile_decoders(endianness) for endianness in ('<', '>')}
+
+
+def get_decoder(record_type: str, endianness: str) -> Callable[[Any], Tuple[Any, ...]]:
+    """Return the precompiled decode function for record_type and endianness."""
+    try:
+        return STDF_DECODERS[endianness][record_type]
+    except KeyError:
+        raise ValueError(f"No decoder found for STDF record type {record_type} (endianness '{endianness}')")
@@ -5,12 +5,15 @@ Consolidates logic from old src/core/stdf/handler.py and STDF-specific
 parts of src/core/utils/setup.py.
 """
 
+import io
 import logging
+import mmap
 import struct
-from typing import Dict, List, Optional, Any, Tuple, IO
+from typing import AbstractSet, Dict, List, Optional, Any, Set, Tuple, IO, Iterator
 
 # Relative imports for components within stdf_parser
-from .unpackers import unpack_dtype, check_invalid_and_set_None_after_unpack
+from .decoders import get_decoder
+from .schema import RecordSchema
 from .templates import get_record_types, create_stdf_mapping, get_stdf_template
 
 # Import from top-level utils
@@ -31,6 +34,16 @@ def setup_record_flags(records_to_process: Optional[List[str]]) -> Dict[str, boo
         record_flags.update({rec: True for rec in records_to_process if rec in record_flags})
     return record_flags
 
+def setup_record_keys(record_flags: Dict[str, bool],
+                      stdf_mapping: Dict[Tuple[int, int], str]) -> Optional[Set[Tuple[int, int]]]:
+    """
+    Translate record processing flags into the set of (rec_typ, rec_sub) header keys to process.
+    Returns None if every record type is enabled, i.e. no header filtering is needed.
+    """
+    if all(record_flags.get(record_type, False) for record_type in stdf_mapping.values()):
+        return None
+    return {key for key, record_type in stdf_mapping.items() if record_flags.get(record_type, False)}
+
 def determine_endianness(byte: bytes) -> str:
     """Determine endianness from STDF file byte."""
     # '>' = big-endian, '<' = little-endian
@@ -61,99 +74,111 @@ def read_record_header(stdf_file: IO[bytes], endianness: str) -> Optional[Tuple[
     rec_len, rec_typ, rec_sub = struct.unpack(endianness + 'HBB', header)
     return rec_len, rec_typ, rec_sub
 
-# --- Functions moved from src/core/stdf/handler.py ---
-
-
-def handle_stdf_entry(stdf_template: Dict, data: bytes, endianness: str) -> Dict:
-    """Process data fields within a single STDF record."""
-    offset = 0
-    stdf_processed_entry = {}
-    
-    data_len = len(data) # Length of the current record's data payload
-
-    if data_len == 0: # Handles records like EPS
-        logger.debug(f"Record type {stdf_template.get('record_type', 'Unknown')} has empty data payload. No fields to parse.")
-        return stdf_processed_entry
-
-    # Start from third field (skip rec_len, rec_typ, rec_sub which are in header)
-    # Ensure 'fields' key exists in the template
-    if 'fields' not in stdf_template:
-        logger.error(f"Template for record type {stdf_template.get('record_type', 'Unknown')} is missing 'fields' key.")
-        return {} # Or raise an error
-
-    fields_to_process = list(stdf_template['fields'].items())[3:]
-
-    for stdf_field, stdf_info in fields_to_process:
-        # >>> THE FIX IS HERE <<<
-        # Check if all data has been consumed BEFORE trying to parse the current field
-        if offset >= data_len:
-            logger.debug(f"No more data in record {stdf_template.get('record_type', 'Unknown')} to parse field '{stdf_field}'. "
-                         f"Offset: {offset}, DataLen: {data_len}. Field will retain default/None.")
-            break # Stop processing further fields for this record; all data consumed.
-        # >>> END OF THE PRIMARY FIX <<<
-        
-        
-        # Ensure stdf_info is a dictionary before accessing keys
-        if not isinstance(stdf_info, dict):
-             logger.warning(f"Invalid field info format for {stdf_field} in record {stdf_template.get('record_type', 'Unknown')}. Skipping field.")
-             continue
+def map_stdf_file(stdf_file: IO[bytes]) -> Optional[mmap.mmap]:
+    """
+    Memory-map an uncompressed STDF file read-only.
+    Returns None for compressed or otherwise unmappable inputs (e.g. gzip streams, empty files).
+    """
+    if not isinstance(getattr(stdf_file, 'raw', None), io.FileIO):
+        return None # Not a plain file on disk (gzip.open returns a GzipFile)
+    try:
+        return mmap.mmap(stdf_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError) as e:
+        logger.debug(f"Could not memory-map STDF file, falling back to buffered reads: {e}")
+        return None
 
-        dtype = stdf_info.get('dtype')
-        ref = stdf_info.get('ref')
+def iter_mapped_records(mapped: mmap.mmap, endianness: str, start: int = 0,
+                        record_keys: Optional[AbstractSet[Tuple[int, int]]] = None,
+                        end: Optional[int] = None) -> Iterator[Tuple[int, int, memoryview]]:
+    """
+    Iterate over the records of a memory-mapped STDF file.
+    Yields (rec_typ, rec_sub, payload) where payload is a zero-copy memoryview slice of the mapping.
+    If record_keys is given, records whose (rec_typ, rec_sub) is not in it are skipped
+    using the header alone. If end is given, iteration stops at the first record starting
+    at or after that offset.
+    """
+    header_struct = struct.Struct(endianness + 'HBB')
+    unpack_header = header_struct.unpack_from
+    file_size = len(mapped)
+    stop = file_size if end is None else min(end, file_size)
+    view = memoryview(mapped)
+    pos = start
+    try:
+        while pos < stop and pos + 4 <= file_size:
+            rec_len, rec_typ, rec_sub = unpack_header(mapped, pos)
+            pos += 4
+            record_end = pos + rec_len
+            if record_end > file_size:
+                logger.error(f"Incomplete record data: expected {rec_len} bytes, got {file_size - pos}")
+                return
+            if record_keys is None or (rec_typ, rec_sub) in record_keys:
+                yield rec_typ, rec_sub, view[pos:record_end]
+            pos = record_end
+        if pos < stop:
+            logger.warning(f"Incomplete record header found at end of file. Expected 4 bytes, got {file_size - pos}.")
+    finally:
+        view.release()
 
-        if dtype is None:
-             logger.warning(f"Missing 'dtype' for field {stdf_field} in record {stdf_template.get('record_type', 'Unknown')}. Skipping field.")
-             continue
+def iter_stdf_records(stdf_file: IO[bytes], endianness: str,
+                      record_keys: Optional[AbstractSet[Tuple[int, int]]] = None,
+                      end: Optional[int] = None) -> Iterator[Tuple[int, int, Any]]:
+    """
+    Iterate over the records of an open STDF file, starting at its current position.
 
-        array_size = 0
-        if ref:
-            ref_field_info = stdf_template['fields'].get(ref)
-            if isinstance(ref_field_info, dict) and 'value' in ref_field_info:
-                 array_size = ref_field_info['value']
-            else:
-                 logger.warning(f"Reference field '{ref}' not found or invalid for field '{stdf_field}' in record {stdf_template.get('record_type', 'Unknown')}. Assuming array size 0.")
-                 # Decide how to handle this - skip field, assume 0, raise error?
-                 # Skipping field might be safest if array size is critical.
-                 continue # Skip this field if array size reference is broken
+    Uncompressed files are memory-mapped and yield memoryview payloads without per-record
+    reads or allocations. Other inputs fall back to read_record_header + read and yield bytes.
+    If record_keys is given (see setup_record_keys), only records with a matching
+    (rec_typ, rec_sub) header are yielded; the payloads of all others are skipped
+    without being read. If end is given, iteration stops at that file offset.
+    """
+    mapped = map_stdf_file(stdf_file)
+    if mapped is None:
+        while end is None or stdf_file.tell() < end:
+            header_data = read_record_header(stdf_file, endianness)
+            if not header_data:
+                return
+            rec_len, rec_typ, rec_sub = header_data
+            if record_keys is not None and (rec_typ, rec_sub) not in record_keys:
+                stdf_file.seek(rec_len, io.SEEK_CUR)
+                continue
+            data = stdf_file.read(rec_len)
+            if len(data) < rec_len:
+                logger.error(f"Incomplete record data: expected {rec_len} bytes, got {len(data)}")
+                return
+            yield rec_typ, rec_sub, data
+        return
 
+    try:
+        yield from iter_mapped_records(mapped, endianness, stdf_file.tell(), record_keys, end)
+    finally:
         try:
-            # Uses unpack_dtype from .unpackers
-            value, offset = unpack_dtype(dtype, data, endianness, offset, array_size=array_size)
-        except struct.error as e:
-            logger.error(f"Struct unpack error for field {stdf_field} (dtype {dtype}) in record {stdf_template.get('record_type', 'Unknown')}: {e}. Offset: {offset}, Data length: {data_len}")
-            # Decide how to handle - skip record, return partial, raise?
-            # Returning partial data might be problematic. Let's skip the rest of the fields for this record.
-            break
-        except IndexError as e:
-             logger.error(f"Index error (likely insufficient data) for field {stdf_field} (dtype {dtype}) in record {stdf_template.get('record_type', 'Unknown')}: {e}. Offset: {offset}, Data length: {data_len}")
-             break # Stop processing this record
-        except Exception as e: # Catch other potential unpack errors
-             logger.error(f"Unexpected error unpacking field {stdf_field} (dtype {dtype}) in record {stdf_template.get('record_type', 'Unknown')}: {e}. Offset: {offset}, Data length: {data_len}")
-             break # Stop processing this record
-
+            mapped.close()
+        except BufferError:
+            # Some payload views are still referenced by the caller; the mapping is
+            # released together with the last of them.
+            logger.debug("STDF memory map still has exported views; leaving it to be released on garbage collection.")
 
-        stdf_info['value'] = value # Update the template dict (might be useful for subsequent refs)
-        stdf_processed_entry[stdf_field] = value
+# --- Functions moved from src/core/stdf/handler.py ---
 
-        # Uses check_invalid_and_set_None_after_unpack from .unpackers
-        # This function modifies stdf_info['value'] in place
-        check_invalid_and_set_None_after_unpack(stdf_template, stdf_field)
-        # Update the processed entry again if the value was set to None
-        stdf_processed_entry[stdf_field] = stdf_info['value']
 
+def handle_stdf_entry(stdf_schema: RecordSchema, data: bytes, endianness: str) -> Tuple[Any, ...]:
+    """
+    Process data fields within a single STDF record.
 
-        if offset > data_len:
-             logger.warning(f"Offset ({offset}) exceeded data length ({data_len}) after processing field {stdf_field} in record {stdf_template.get('record_type', 'Unknown')}. Record may be corrupt or truncated.")
-             break # Stop processing this record
-        elif offset == data_len:
-             break # End of data for this record
+    Decoding is done by the precompiled decoder for the record type (see .decoders).
+    Returns the decoded values as a tuple in schema order; fields omitted at the end
+    of a truncated record are not included (stdf_schema.as_dict gives them by name).
+    """
+    record_type = stdf_schema.record_type
 
-    # Check if offset matches rec_len at the end (optional validation)
-    # rec_len_from_header = stdf_template['fields']['rec_len']['value']
-    # if offset != rec_len_from_header:
-    #    logger.warning(f"Final offset ({offset}) does not match record length ({rec_len_from_header}) for record {stdf_template.get('record_type', 'Unknown')}")
+    if len(data) == 0: # Handles records like EPS
+        logger.debug(f"Record type {record_type} has empty data payload. No fields to parse.")
+        return ()
 
-    return stdf_processed_entry
+    # Uses the decoder compiled from the record schema by .decoders.
+    # 'missing' conditions are already applied by the decoder.
+    decode = get_decoder(record_type, endianness)
+    return decode(data)
 # handle_stdf_entries function removed as per refactoring plan.
 # Its logic will be integrated into src/converter.py process_record.
 # --- Main Orchestration Function ---
@@ -0,0 +1,326 @@
+# src/core/stdf_parser/index.py
+"""
+Persistent record-offset index ("sidecar") for random access into STDF files.
+
+A header-only scan records (offset, rec_typ, rec_sub, rec_len) for every record
+plus the record positions of MIR, WIR/WRR and PIR/PRR. The index is written next
+to the STDF file (input.stdf -> input.stdf.idx) and reused as long as the STDF
+file is unchanged, so a wafer, part or record type can be read with direct seeks
+instead of re-parsing the file from byte 0.
+"""
+
+import bisect
+import logging
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .decoders import get_decoder
+from .schema import get_stdf_schema
+from ..records import get_stdf_record_class
+from .handler import determine_file_params, map_stdf_file, read_record_header
+from .templates import create_stdf_mapping
+
+# Import from top-level utils
+from ...utils.files import get_file_handle
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'STDFIDX\x00'
+INDEX_VERSION = 1
+# magic, version, endianness, source size, source mtime (ns), record count
+INDEX_HEADER = struct.Struct('<8sBcQqQ')
+# Record types whose positions are stored as markers
+MARKER_RECORD_TYPES = ('MIR', 'WIR', 'WRR', 'PIR', 'PRR')
+# Test records that belong to the part opened by a PIR with the same head/site
+PART_TEST_RECORD_TYPES = ('PTR', 'MPR', 'FTR')
+# Offset of HEAD_NUM/SITE_NUM in the payload of PIR/PRR and PTR/MPR/FTR
+PART_HEAD_SITE_OFFSET = {'PIR': 0, 'PRR': 0, 'PTR': 4, 'MPR': 4, 'FTR': 4}
+
+
+class StdfIndex:
+    """
+    In-memory form of the record-offset index.
+
+    Records are addressed by their ordinal (position in the file, starting at 0).
+    Wafer and part numbers start at 1 and follow the order of WIR and PIR records,
+    i.e. they match the w_id and p_id assigned by the id enricher.
+    """
+
+    def __init__(self, endianness: str, source_size: int, source_mtime_ns: int,
+                 offsets: array, rec_typs: array, rec_subs: array, rec_lens: array,
+                 markers: Dict[str, array]):
+        self.endianness = endianness
+        self.source_size = source_size
+        self.source_mtime_ns = source_mtime_ns
+        self.offsets = offsets
+        self.rec_typs = rec_typs
+        self.rec_subs = rec_subs
+        self.rec_lens = rec_lens
+        self.markers = markers
+        self._stdf_mapping = create_stdf_mapping()
+        self._record_key_by_type = {record_type: key for key, record_type in self._stdf_mapping.items()}
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def record_type(self, ordinal: int) -> Optional[str]:
+        """Return the record type name of a record, or None for unknown records."""
+        return self._stdf_mapping.get((self.rec_typs[ordinal], self.rec_subs[ordinal]))
+
+    def record_ordinals(self, record_type: str) -> List[int]:
+        """Return the ordinals of all records of record_type."""
+        if record_type in self.markers:
+            return list(self.markers[record_type])
+        key = self._record_key_by_type.get(record_type)
+        if key is None:
+            raise ValueError(f"Unknown STDF record type {record_type}")
+        rec_typ, rec_sub = key
+        rec_subs = self.rec_subs
+        return [ordinal for ordinal, typ in enumerate(self.rec_typs) if typ == rec_typ and rec_subs[ordinal] == rec_sub]
+
+    def wafer_range(self, wafer_number: int) -> Tuple[int, int]:
+        """
+        Return the (first, last) record ordinals of a wafer: its WIR up to and including
+        the next WRR, or up to the end of the file if the wafer has no WRR.
+        """
+        wirs = self.markers['WIR']
+        if not 1 <= wafer_number <= len(wirs):
+            raise ValueError(f"Wafer {wafer_number} not found; file has {len(wirs)} wafer(s)")
+        first = wirs[wafer_number - 1]
+        wrrs = self.markers['WRR']
+        wrr_position = bisect.bisect_right(wrrs, first)
+        last = wrrs[wrr_position] if wrr_position < len(wrrs) else len(self) - 1
+        return first, last
+
+    def split(self, chunk_count: int) -> List[Tuple[int, int]]:
+        """
+        Split the file into at most chunk_count byte ranges (start, end) of similar size.
+        Every range starts at a record header and ends where the next range starts.
+        """
+        if not len(self):
+            return []
+        starts = []
+        for chunk_number in range(chunk_count):
+            ordinal = bisect.bisect_left(self.offsets, self.source_size * chunk_number // chunk_count)
+            if ordinal < len(self) and (not starts or self.offsets[ordinal] > starts[-1]):
+                starts.append(self.offsets[ordinal])
+        return list(zip(starts, starts[1:] + [self.source_size]))
+
+    def is_stale(self, stdf_path: str) -> bool:
+        """Check whether the STDF file changed since the index was built."""
+        stat = os.stat(stdf_path)
+        return stat.st_size != self.source_size or stat.st_mtime_ns != self.source_mtime_ns
+
+
+def get_index_path(stdf_path: str) -> str:
+    """Return the sidecar index path for an STDF file (input.stdf -> input.stdf.idx)."""
+    return str(Path(stdf_path)) + INDEX_SUFFIX
+
+
+def _scan_record_headers(stdf_file, endianness: str) -> Iterator[Tuple[int, int, int, int]]:
+    """
+    Yield (offset, rec_typ, rec_sub, rec_len) for every record, reading headers only.
+    A last record running past the end of the file is logged and not yielded.
+    """
+    mapped = map_stdf_file(stdf_file)
+    if mapped is None:
+        offset = stdf_file.tell()
+        while True:
+            header_data = read_record_header(stdf_file, endianness)
+            if not header_data:
+                return
+            rec_len, rec_typ, rec_sub = header_data
+            if rec_len:
+                # Read the last payload byte only, to find out whether the record is complete
+                stdf_file.seek(rec_len - 1, os.SEEK_CUR)
+                if not stdf_file.read(1):
+                    logger.error(f"Incomplete record data at byte {offset}: expected {rec_len} bytes")
+                    return
+            yield offset, rec_typ, rec_sub, rec_len
+            offset = stdf_file.tell()
+        return
+
+    try:
+        unpack_header = struct.Struct(endianness + 'HBB').unpack_from
+        file_size = len(mapped)
+        offset = 0
+        while offset + 4 <= file_size:
+            rec_len, rec_typ, rec_sub = unpack_header(mapped, offset)
+            if offset + 4 + rec_len > file_size:
+                logger.error(f"Incomplete record data at byte {offset}: expected {rec_len} bytes, "
+                             f"got {file_size - offset - 4}")
+                return
+            yield offset, rec_typ, rec_sub, rec_len
+            offset += 4 + rec_len
+    finally:
+        mapped.close()
+
+
+def scan_index(stdf_path: str) -> StdfIndex:
+    """Scan the record headers of an STDF file into an in-memory index (nothing is written)."""
+    stdf_mapping = create_stdf_mapping()
+    marker_keys = {key: record_type for key, record_type in stdf_mapping.items()
+                   if record_type in MARKER_RECORD_TYPES}
+    offsets, rec_typs, rec_subs, rec_lens = array('Q'), array('B'), array('B'), array('H')
+    markers = {record_type: array('Q') for record_type in MARKER_RECORD_TYPES}
+
+    with get_file_handle(stdf_path, 'rb') as stdf_file:
+        endianness = determine_file_params(stdf_file)['endianness']
+        for ordinal, (offset, rec_typ, rec_sub, rec_len) in enumerate(_scan_record_headers(stdf_file, endianness)):
+            offsets.append(offset)
+            rec_typs.append(rec_typ)
+            rec_subs.append(rec_sub)
+            rec_lens.append(rec_len)
+            marker_type = marker_keys.get((rec_typ, rec_sub))
+            if marker_type:
+                markers[marker_type].append(ordinal)
+
+    stat = os.stat(stdf_path)
+    return StdfIndex(endianness, stat.st_size, stat.st_mtime_ns, offsets, rec_typs, rec_subs, rec_lens, markers)
+
+
+def build_index(stdf_path: str, index_path: Optional[str] = None) -> StdfIndex:
+    """Scan the record headers of an STDF file and write the index sidecar."""
+    index = scan_index(stdf_path)
+    write_index(index, index_path or get_index_path(stdf_path))
+    logger.info(f"Indexed {len(index)} records of {stdf_path}")
+    return index
+
+
+def _write_array(index_file, values: array) -> None:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(index_file)
+
+
+def _read_array(index_file, typecode: str, count: int) -> array:
+    values = array(typecode)
+    values.fromfile(index_file, count)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def write_index(index: StdfIndex, index_path: str) -> None:
+    """Write an index to disk (little-endian, fixed layout)."""
+    with open(index_path, 'wb') as index_file:
+        index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, index.endianness.encode(),
+                                           index.source_size, index.source_mtime_ns, len(index)))
+        for record_type in MARKER_RECORD_TYPES:
+            index_file.write(struct.pack('<Q', len(index.markers[record_type])))
+            _write_array(index_file, index.markers[record_type])
+        for values in (index.offsets, index.rec_typs, index.rec_subs, index.rec_lens):
+            _write_array(index_file, values)
+
+
+def read_index(index_path: str) -> StdfIndex:
+    """Read an index written by write_index."""
+    with open(index_path, 'rb') as index_file:
+        magic, version, endianness, source_size, source_mtime_ns, record_count = \
+            INDEX_HEADER.unpack(index_file.read(INDEX_HEADER.size))
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"{index_path} is not a version {INDEX_VERSION} STDF index file")
+        markers = {}
+        for record_type in MARKER_RECORD_TYPES:
+            count = struct.unpack('<Q', index_file.read(8))[0]
+            markers[record_type] = _read_array(index_file, 'Q', count)
+        offsets = _read_array(index_file, 'Q', record_count)
+        rec_typs = _read_array(index_file, 'B', record_count)
+        rec_subs = _read_array(index_file, 'B', record_count)
+        rec_lens = _read_array(index_file, 'H', record_count)
+    return StdfIndex(endianness.decode(), source_size, source_mtime_ns, offsets, rec_typs, rec_subs, rec_lens, markers)
+
+
+def load_index(stdf_path: str, index_path: Optional[str] = None) -> StdfIndex:
+    """Load the index sidecar of an STDF file, (re)building it if it is missing or stale."""
+    index_path = index_path or get_index_path(stdf_path)
+    if os.path.exists(index_path):
+        try:
+            index = read_index(index_path)
+            if not index.is_stale(stdf_path):
+                return index
+            logger.info(f"Index {index_path} is out of date, rebuilding")
+        except (ValueError, EOFError, struct.error) as e:
+            logger.warning(f"Could not read index {index_path}, rebuilding: {e}")
+    return build_index(stdf_path, index_path)
+
+
+class IndexedStdfReader:
+    """
+    Random access to the records of an STDF file through its index.
+    Records are returned as (record_type, stdf_entry) with stdf_entry the decoded values by field name,
+    or a slot record (see core.records) if compact_records is set.
+    """
+
+    def __init__(self, stdf_path: str, index: Optional[StdfIndex] = None, compact_records: bool = False):
+        self.stdf_path = stdf_path
+        self.compact_records = compact_records
+        self.index = index or load_index(stdf_path)
+        self._stdf_file = get_file_handle(stdf_path, 'rb')
+
+    def close(self) -> None:
+        self._stdf_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _read_payload(self, ordinal: int, length: Optional[int] = None) -> bytes:
+        self._stdf_file.seek(self.index.offsets[ordinal] + 4)
+        return self._stdf_file.read(self.index.rec_lens[ordinal] if length is None else length)
+
+    def _head_site(self, ordinal: int, record_type: str) -> Tuple[int, ...]:
+        position = PART_HEAD_SITE_OFFSET[record_type]
+        return tuple(self._read_payload(ordinal, position + 2)[position:position + 2])
+
+    def read_record(self, ordinal: int) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Decode a single record by ordinal."""
+        record_type = self.index.record_type(ordinal)
+        if record_type is None:
+            raise ValueError(f"No template found for rec_typ={self.index.rec_typs[ordinal]}, "
+                             f"rec_sub={self.index.rec_subs[ordinal]}")
+        values = get_decoder(record_type, self.index.endianness)(self._read_payload(ordinal))
+        if self.compact_records:
+            return record_type, get_stdf_record_class(record_type).from_values(values)
+        return record_type, get_stdf_schema(record_type).as_dict(values)
+
+    def read_records(self, ordinals) -> List[Tuple[Optional[str], Dict[str, Any]]]:
+        """Decode the records at the given ordinals, skipping unknown record types."""
+        return [self.read_record(ordinal) for ordinal in ordinals if self.index.record_type(ordinal) is not None]
+
+    def read_record_type(self, record_type: str) -> List[Dict[str, Any]]:
+        """Decode all records of one record type."""
+        return [entry for _, entry in self.read_records(self.index.record_ordinals(record_type))]
+
+    def read_wafer(self, wafer_number: int) -> List[Tuple[Optional[str], Dict[str, Any]]]:
+        """Decode all records of a wafer, from its WIR up to and including its WRR."""
+        first, last = self.index.wafer_range(wafer_number)
+        return self.read_records(range(first, last + 1))
+
+    def read_part(self, part_number: int) -> List[Tuple[Optional[str], Dict[str, Any]]]:
+        """
+        Decode the records of a part: its PIR, the PTR/MPR/FTR records with the same
+        head/site up to the matching PRR, and that PRR.
+        """
+        pirs = self.index.markers['PIR']
+        if not 1 <= part_number <= len(pirs):
+            raise ValueError(f"Part {part_number} not found; file has {len(pirs)} part(s)")
+        pir_ordinal = pirs[part_number - 1]
+        head_site = self._head_site(pir_ordinal, 'PIR')
+        ordinals = [pir_ordinal]
+        for ordinal in range(pir_ordinal + 1, len(self.index)):
+            record_type = self.index.record_type(ordinal)
+            if record_type == 'PRR' and self._head_site(ordinal, record_type) == head_site:
+                ordinals.append(ordinal)
+                break
+            if record_type in PART_TEST_RECORD_TYPES and self._head_site(ordinal, record_type) == head_site:
+                ordinals.append(ordinal)
+        return self.read_records(ordinals)
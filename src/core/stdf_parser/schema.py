@@ -0,0 +1,96 @@
+# src/core/stdf_parser/schema.py
+"""
+Immutable per-record-type schemas derived from STDF_TEMPLATES.
+
+A RecordSchema holds everything about a record type that does not change from
+record to record: field names and dtypes, the array-size reference of each
+field resolved to a field position, and the precompiled 'missing' predicates.
+Decoded records are plain tuples of values in schema order, so no template dict
+is copied or written per record, and schemas can be shared between threads.
+"""
+import logging
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .templates import STDF_TEMPLATES
+from .unpackers import MissingPredicate, compile_missing_predicate
+
+logger = logging.getLogger(__name__)
+
+# Number of header fields (rec_len, rec_typ, rec_sub) at the start of every template.
+HEADER_FIELD_COUNT = 3
+
+
+class RecordSchema(NamedTuple):
+    """Frozen description of the payload fields of one STDF record type (header fields excluded)."""
+    record_type: str
+    field_names: Tuple[str, ...]
+    dtypes: Tuple[str, ...]
+    refs: Tuple[Optional[int], ...] # Position of the field holding the array size, per field
+    field_index: Mapping[str, int] # Field name -> position (read-only)
+    missing_checks: Tuple[Tuple[int, MissingPredicate], ...] # (position, predicate), in field order
+
+    def as_dict(self, values: Sequence[Any]) -> Dict[str, Any]:
+        """
+        Return the decoded values of a record as a dict by field name.
+        Fields omitted at the end of a truncated record (values shorter than the schema) are absent.
+        """
+        return dict(zip(self.field_names, values))
+
+    def get(self, values: Sequence[Any], field_name: str) -> Any:
+        """Return the value of field_name, or None if it was omitted from the record."""
+        position = self.field_index[field_name]
+        return values[position] if position < len(values) else None
+
+
+def compile_schema(record_type: str) -> RecordSchema:
+    """Build the schema of record_type from its STDF template."""
+    if record_type not in STDF_TEMPLATES:
+        raise ValueError(f"No template found for STDF record type {record_type}")
+
+    fields = list(STDF_TEMPLATES[record_type].items())[HEADER_FIELD_COUNT:]
+    field_names = tuple(name for name, _ in fields)
+    field_index = {name: i for i, name in enumerate(field_names)}
+
+    refs = []
+    for name, info in fields:
+        ref = info.get('ref')
+        if ref and ref not in field_index:
+            raise ValueError(f"Reference field '{ref}' not found for field '{name}' in record {record_type}")
+        refs.append(field_index[ref] if ref else None)
+
+    # 'missing' conditions parsed once into (index, predicate) pairs, in field order
+    missing_checks = []
+    for i, (name, info) in enumerate(fields):
+        predicate = compile_missing_predicate(name, info, field_index)
+        if predicate is not None:
+            missing_checks.append((i, predicate))
+
+    return RecordSchema(
+        record_type=record_type,
+        field_names=field_names,
+        dtypes=tuple(info['dtype'] for _, info in fields),
+        refs=tuple(refs),
+        field_index=MappingProxyType(field_index),
+        missing_checks=tuple(missing_checks),
+    )
+
+
+# Built once at import time.
+STDF_SCHEMAS = {record_type: compile_schema(record_type) for record_type in STDF_TEMPLATES}
+
+
+def get_stdf_schema(record_type: str) -> RecordSchema:
+    """Return the schema of record_type."""
+    try:
+        return STDF_SCHEMAS[record_type]
+    except KeyError:
+        raise ValueError(f"No template found for STDF record type {record_type}")
+
+
+def find_stdf_schema(stdf_mapping: Dict[Tuple[int, int], str], rec_typ: int, rec_sub: int) -> RecordSchema:
+    """Return the schema of the record type with header (rec_typ, rec_sub)."""
+    record_type = stdf_mapping.get((rec_typ, rec_sub))
+    if record_type is None:
+        raise ValueError(f"No template found for rec_typ={rec_typ}, rec_sub={rec_sub}")
+    return STDF_SCHEMAS[record_type]
@@ -0,0 +1,179 @@
+# src/utils/compression.py
+"""
+Reading compressed STDF inputs (gzip, bz2, xz) with read-ahead decompression.
+
+The compression format is detected from the magic bytes at the start of the
+file, not from its extension. A background thread decompresses the input in
+large chunks into a bounded queue while the parser works on the previous ones;
+zlib, bz2 and lzma release the GIL while they decompress, so decompression and
+decoding overlap. The parser reads through an io.BufferedReader, so its small
+header reads stay cheap.
+"""
+import bz2
+import gzip
+import io
+import logging
+import lzma
+import queue
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Magic bytes at the start of the file -> compression format
+COMPRESSION_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'BZh': 'bz2',
+    b'\xfd7zXZ\x00': 'xz',
+}
+MAGIC_SIZE = max(len(magic) for magic in COMPRESSION_MAGIC)
+
+DECOMPRESSORS = {
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+
+# Size of the decompressed chunks and the number of chunks decompressed ahead of the parser
+READ_AHEAD_CHUNK_SIZE = 1 << 20
+READ_AHEAD_CHUNKS = 8
+# Buffer of the io.BufferedReader the parser reads from
+READ_BUFFER_SIZE = 1 << 16
+
+
+def detect_compression(file_path: str) -> Optional[str]:
+    """Return the compression format of a file ('gzip', 'bz2' or 'xz') from its magic bytes, None if uncompressed."""
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(MAGIC_SIZE)
+    except OSError:
+        return None
+    for magic, compression in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+class ReadAheadDecompressor(io.RawIOBase):
+    """
+    Raw binary stream of the decompressed content of a file, decompressed by a background thread.
+
+    Seeking forward skips decompressed data; seeking backward within the current chunk is
+    free, further back the decompression restarts from the beginning of the file.
+    """
+
+    def __init__(self, file_path: str, compression: str,
+                 chunk_size: int = READ_AHEAD_CHUNK_SIZE, max_chunks: int = READ_AHEAD_CHUNKS):
+        if compression not in DECOMPRESSORS:
+            raise ValueError(f"Unsupported compression format: {compression}")
+        self.file_path = file_path
+        self.compression = compression
+        self._chunk_size = chunk_size
+        self._max_chunks = max_chunks
+        self._thread: Optional[threading.Thread] = None
+        self._start()
+
+    def _start(self) -> None:
+        """Start decompressing from the beginning of the file."""
+        self._chunk = memoryview(b'')
+        self._chunk_start = 0 # Offset of the current chunk in the decompressed stream
+        self._chunk_pos = 0 # Read position within the current chunk
+        self._eof = False
+        self._stop_event = threading.Event()
+        self._chunks: queue.Queue = queue.Queue(maxsize=self._max_chunks)
+        self._thread = threading.Thread(target=self._decompress, args=(self._stop_event, self._chunks),
+                                        name=f"read-ahead-{self.compression}", daemon=True)
+        self._thread.start()
+
+    def _decompress(self, stop_event: threading.Event, chunks: queue.Queue) -> None:
+        """Thread body: put decompressed chunks, then b'' at the end (or the exception that stopped it)."""
+        def put(item) -> bool:
+            while not stop_event.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            with DECOMPRESSORS[self.compression](self.file_path, 'rb') as f:
+                while True:
+                    chunk = f.read(self._chunk_size)
+                    if not put(chunk) or not chunk:
+                        return
+        except Exception as e:
+            put(e)
+
+    def _stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        # Unblock a thread waiting for space in the queue
+        try:
+            while True:
+                self._chunks.get_nowait()
+        except queue.Empty:
+            pass
+        self._thread.join()
+        self._thread = None
+
+    def _next_chunk(self) -> bool:
+        """Move to the next decompressed chunk. Returns False at the end of the stream."""
+        if self._eof:
+            return False
+        item = self._chunks.get()
+        if isinstance(item, BaseException):
+            self._eof = True
+            raise item
+        self._chunk_start += len(self._chunk)
+        self._chunk = memoryview(item)
+        self._chunk_pos = 0
+        if not item:
+            self._eof = True
+            return False
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._chunk_pos >= len(self._chunk) and not self._next_chunk():
+            return 0
+        count = min(len(buffer), len(self._chunk) - self._chunk_pos)
+        buffer[:count] = self._chunk[self._chunk_pos:self._chunk_pos + count]
+        self._chunk_pos += count
+        return count
+
+    def tell(self) -> int:
+        return self._chunk_start + self._chunk_pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Compressed inputs can only seek from the start or the current position")
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        if offset < self._chunk_start:
+            # Before the current chunk: decompress again from the start
+            self._stop()
+            self._start()
+        while offset > self._chunk_start + len(self._chunk):
+            if not self._next_chunk():
+                break # Past the end of the stream; position at its end
+        self._chunk_pos = min(offset - self._chunk_start, len(self._chunk))
+        return self.tell()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop()
+        super().close()
+
+
+def open_compressed(file_path: str, compression: str) -> io.BufferedReader:
+    """Open a compressed file for binary reading with read-ahead decompression."""
+    return io.BufferedReader(ReadAheadDecompressor(file_path, compression), buffer_size=READ_BUFFER_SIZE)
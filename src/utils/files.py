@@ -1,13 +1,17 @@
 # src/utils/files.py
 """Utilities for file handling operations."""
+import glob
 import gzip
+import struct
 from pathlib import Path
 import logging
-from typing import List, Optional # Added Optional
+from typing import AbstractSet, Dict, List, Optional, Tuple # Added Optional
 from contextlib import contextmanager # Added contextmanager
 
+from .compression import detect_compression, open_compressed
+
 # Note: 'contextlib.contextmanager' and 'struct' were not needed for the selected functions.
-# 'struct' is still not needed.
+# 'struct' is now used by check_stdf_header.
 
 logger = logging.getLogger(__name__)
 
@@ -47,10 +51,22 @@ logger = logging.getLogger(__name__)
 # Removing the second (appended) is_binary (lines 74-76)
 
 # Cleaned up comments
+def is_compressed(file_path: str) -> bool:
+    """Check if a file is compressed (gzip, bz2 or xz, detected from its magic bytes)."""
+    return detect_compression(file_path) is not None
+
 def get_file_handle(file_path: str, mode: str):
-    """Get appropriate file handle for regular or gzip files."""
-    file_extension = Path(file_path).suffix.lower()
-    if file_extension == '.gz':
+    """
+    Get appropriate file handle for regular or compressed files.
+    Compressed inputs opened for binary reading are decompressed ahead by a background
+    thread (see utils.compression); other modes use gzip for a .gz suffix.
+    """
+    if 'r' in mode and 'b' in mode:
+        compression = detect_compression(file_path)
+        if compression:
+            return open_compressed(file_path, compression)
+        return open(file_path, mode)
+    if Path(file_path).suffix.lower() == '.gz':
         return gzip.open(file_path, mode)
     return open(file_path, mode)
 
@@ -62,16 +78,44 @@ def is_file(path: str) -> bool:
     """Check if path is a valid file."""
     return Path(path).is_file()
 
-# Removed find_stdf_files function
-# def find_stdf_files(path: Path) -> List[Path]:
-#     """Find all STDF files in a directory and its subdirectories."""
-#     if path.is_file():
-#         return [path]
-#
-#     stdf_files = []
-#     for pattern in ['*.stdf', '*.STDF']:
-#         stdf_files.extend(path.rglob(pattern))
-#     return sorted(stdf_files)  # Sort for predictable processing order
+STDF_FILE_PATTERNS = ['*.stdf', '*.STDF', '*.stdf.gz', '*.STDF.gz', '*.stdf.bz2', '*.STDF.bz2',
+                      '*.stdf.xz', '*.STDF.xz']
+
+def find_stdf_files(inputs: List[str]) -> List[Path]:
+    """
+    Find all STDF files given by a list of files, directories and glob patterns.
+    Directories are searched recursively for .stdf files, also compressed (.stdf.gz, .stdf.bz2, .stdf.xz).
+    """
+    stdf_files = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_file():
+            stdf_files.append(path)
+        elif path.is_dir():
+            for pattern in STDF_FILE_PATTERNS:
+                stdf_files.extend(path.rglob(pattern))
+        else:
+            matches = [Path(match) for match in glob.glob(item, recursive=True)]
+            if not matches:
+                logger.warning(f"No files match {item}")
+            stdf_files.extend(match for match in matches if match.is_file())
+    # Remove duplicates (e.g. a file given directly and through its directory)
+    unique_files = {file.resolve(): file for file in stdf_files}
+    return sorted(unique_files.values())  # Sort for predictable processing order
+
+def get_output_paths(input_path: Path, output_formats: Optional[List[str]]) -> Dict[str, Optional[str]]:
+    """
+    Return the output paths for an input file, named after the input file: ATDF, JSON, JSON Lines,
+    statistics (.stats.json) and the CSV prefix (CSV files are '<prefix>.<record type>.csv').
+    """
+    output_formats = output_formats or []
+    return {
+        'atdf': str(input_path.with_suffix('.atdf')) if 'atdf' in output_formats else None,
+        'json': str(input_path.with_suffix('.json')) if 'json' in output_formats else None,
+        'ndjson': str(input_path.with_suffix('.ndjson')) if 'ndjson' in output_formats else None,
+        'csv': str(input_path.with_suffix('')) if 'csv' in output_formats else None,
+        'stats': str(input_path.with_suffix('.stats.json')) if 'stats' in output_formats else None,
+    }
 
 # Original comment for validate_input_file was:
 # Note: This function originally imported 'is_file' from '.files'.
@@ -82,15 +126,32 @@ def validate_input_file(input_stdf_file: str) -> None:
         message = f"File {input_stdf_file} does not exist"
         logger.error(message)
         raise ValueError(message)
+
+def validate_stdf_file(stdf_path: str, chain_check_bytes: int = 0) -> str:
+    """
+    Check that a file is an STDF V4 file (see check_stdf_header) without keeping it open,
+    e.g. before any output file is created. Returns the byte order; raises ValueError if invalid.
+    """
+    with get_file_handle(stdf_path, 'rb') as stdf_file:
+        try:
+            return check_stdf_header(stdf_file, chain_check_bytes)
+        except ValueError as e:
+            logger.error(f"Invalid STDF file {stdf_path}: {e}")
+            raise
+
 @contextmanager
-def managed_files(stdf_path: str, atdf_path: Optional[str] = None):
-    """Context manager for handling file resources safely."""
+def managed_files(stdf_path: str, atdf_path: Optional[str] = None, chain_check_bytes: int = 0):
+    """
+    Context manager for handling file resources safely.
+    The STDF file is validated from its FAR header (see check_stdf_header); with
+    chain_check_bytes, the record chain of that many leading bytes is checked as well.
+    """
     stdf_file = None
     atdf_file = None
     try:
         # Assumes get_file_handle is defined in this module (which it is)
         stdf_file = get_file_handle(stdf_path, 'rb')
-        reset_and_check_binary(stdf_file) # Assumes reset_and_check_binary is defined in this module
+        check_stdf_header(stdf_file, chain_check_bytes)
 
         if atdf_path:
             atdf_file = get_file_handle(atdf_path, 'w')
@@ -107,9 +168,72 @@ def managed_files(stdf_path: str, atdf_path: Optional[str] = None):
 # Removed duplicate is_binary function that was here.
 # The first definition (lines 57-59) is kept.
 
-def reset_and_check_binary(file_handle) -> None:
-    """Reset file pointer and verify binary content."""
+# FAR record: REC_LEN=2, REC_TYP=0, REC_SUB=10, CPU_TYPE, STDF_VER
+FAR_RECORD_SIZE = 6
+FAR_HEADER = (2, 0, 10)
+# Byte order of the integers in the file by CPU_TYPE (0: VAX/PDP-11, 1: Sun 1-4 (68k, SPARC), 2: Sun 386i, PCs)
+STDF_CPU_TYPES = {0: '<', 1: '>', 2: '<'}
+STDF_VERSION = 4
+# Number of leading bytes whose record chain is checked with --check-chain (see check_stdf_header)
+STDF_CHAIN_CHECK_BYTES = 1 << 20
+# REC_TYP values the STDF V4 specification reserves for custom records (any REC_SUB)
+STDF_CUSTOM_REC_TYPES = {180, 181}
+
+def get_stdf_record_keys() -> AbstractSet[Tuple[int, int]]:
+    """The (REC_TYP, REC_SUB) pairs of the STDF V4 record types."""
+    from ..core.stdf_parser.templates import create_stdf_mapping
+    return create_stdf_mapping().keys()
+
+def check_record_chain(prefix: bytes, endianness: str, is_whole_file: bool) -> None:
+    """
+    Walk the record headers in prefix (the leading bytes of an STDF file) and check that
+    every header is of a known STDF V4 record type (or a custom REC_TYP 180/181) and that
+    every record fits: in the whole file, the last record has to end exactly at the end of
+    the file; in a prefix, it may continue after it.
+    """
+    header_struct = struct.Struct(endianness + 'HBB')
+    record_keys = get_stdf_record_keys()
+    pos = 0
+    record_count = 0
+    while pos + 4 <= len(prefix):
+        rec_len, rec_typ, rec_sub = header_struct.unpack_from(prefix, pos)
+        if (rec_typ, rec_sub) not in record_keys and rec_typ not in STDF_CUSTOM_REC_TYPES:
+            raise ValueError(f"Broken STDF record chain: record {record_count + 1} at byte {pos} has an unknown "
+                             f"type (REC_TYP={rec_typ}, REC_SUB={rec_sub})")
+        pos += 4 + rec_len
+        record_count += 1
+    if is_whole_file and pos != len(prefix):
+        raise ValueError(f"Broken STDF record chain: record {record_count} (REC_TYP={rec_typ}, REC_SUB={rec_sub}) "
+                         f"ends at byte {pos}, but the file has {len(prefix)} bytes")
+
+def check_stdf_header(file_handle, chain_check_bytes: int = 0) -> str:
+    """
+    Validate an STDF V4 file from its FAR record, reading only the first bytes of the file:
+    REC_LEN 2, REC_TYP 0, REC_SUB 10, a known CPU_TYPE and STDF_VER 4.
+    With chain_check_bytes, also check the record chain over that many leading bytes
+    (see check_record_chain). The file pointer is reset to the start of the file.
+
+    Returns the byte order ('<' or '>') given by CPU_TYPE.
+    Raises ValueError if the file is not an STDF V4 file.
+    """
+    file_handle.seek(0)
+    # One byte more than checked tells whether the prefix is the whole file
+    prefix = file_handle.read(max(FAR_RECORD_SIZE, chain_check_bytes + 1))
     file_handle.seek(0)
-    if not is_binary(file_handle.read()): # Assumes is_binary is defined in this module
-        raise ValueError("File content is not binary")
-    file_handle.seek(0)
\ No newline at end of file
+    if len(prefix) < FAR_RECORD_SIZE:
+        raise ValueError(f"File is not an STDF file: only {len(prefix)} bytes, too short for a FAR record")
+
+    cpu_type, stdf_version = prefix[4], prefix[5]
+    endianness = STDF_CPU_TYPES.get(cpu_type)
+    if endianness is None:
+        raise ValueError(f"File is not an STDF file: unknown CPU_TYPE {cpu_type} in FAR record")
+    far_header = struct.unpack_from(endianness + 'HBB', prefix)
+    if far_header != FAR_HEADER:
+        raise ValueError(f"File is not an STDF file: does not start with a FAR record "
+                         f"(REC_LEN={far_header[0]}, REC_TYP={far_header[1]}, REC_SUB={far_header[2]})")
+    if stdf_version != STDF_VERSION:
+        raise ValueError(f"Unsupported STDF version {stdf_version}; only STDF V{STDF_VERSION} is supported")
+
+    if chain_check_bytes:
+        check_record_chain(prefix[:chain_check_bytes], endianness, is_whole_file=len(prefix) <= chain_check_bytes)
+    return endianness
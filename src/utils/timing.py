@@ -0,0 +1,37 @@
+# src/utils/timing.py
+"""
+Timing of the stages of a pipelined conversion.
+
+Each stage (reader thread, decoder, writer threads) updates its own StageTimer
+once per batch of records, so timing costs nothing per record. busy is the time
+the stage spent working, waiting the time it spent blocked on a queue: an
+upstream stage with nothing ready yet, or a full queue of a downstream stage.
+"""
+import logging
+from typing import Any, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """Busy and waiting time of one pipeline stage, and the records it handled."""
+    __slots__ = ('name', 'busy', 'waiting', 'records')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.busy = 0.0 # Seconds
+        self.waiting = 0.0 # Seconds
+        self.records = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'busy_seconds': round(self.busy, 3), 'waiting_seconds': round(self.waiting, 3),
+                'records': self.records}
+
+
+def log_stage_timings(timers: Iterable[StageTimer]) -> Dict[str, Dict[str, Any]]:
+    """Log the timers and return them as {stage name: as_dict()}."""
+    timings = {timer.name: timer.as_dict() for timer in timers}
+    logger.info("Pipeline stages: " + "; ".join(
+        f"{name}: {timing['busy_seconds']:.2f} s busy, {timing['waiting_seconds']:.2f} s waiting, "
+        f"{timing['records']} records" for name, timing in timings.items()))
+    return timings